@@ -0,0 +1,132 @@
+from buildlog import logger
+from manifest import BuildManifest, file_hash, remove_output
+import os
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LINK_MODES = ("auto", "copy", "hardlink", "reflink")
+FICLONE = 0x40049409
+
+
+class SyncReport:
+    def __init__(self):
+        self.copied = []
+        self.skipped = []
+        self.removed = []
+        self.bytes_copied = 0
+        self.bytes_skipped = 0
+
+    def counts(self) -> dict:
+        return {
+            "copied": len(self.copied),
+            "skipped": len(self.skipped),
+            "removed": len(self.removed),
+            "bytes_copied": self.bytes_copied,
+            "bytes_skipped": self.bytes_skipped,
+        }
+
+    def summary(self) -> str:
+        return "Static files: {copied} copied ({bytes_copied} bytes), {skipped} unchanged ({bytes_skipped} bytes), {removed} removed".format(**self.counts())
+
+
+def _reflink(src: str, dst: str):
+    if fcntl == None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    shutil.copystat(src, dst)
+
+
+def sync_file(src: str, dst: str, link: str = "auto") -> str:
+    # Writes to a temporary name first so a reader never sees a half copied file. The name is
+    # unique per process and thread, like the one write_output uses, so it cannot clash with
+    # a static file called <name>.tmp or another sync of the same file
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    tmp_path = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    method = "copy"
+    try:
+        if link in ("auto", "reflink"):
+            try:
+                _reflink(src, tmp_path)
+                method = "reflink"
+            except OSError:
+                pass
+        elif link == "hardlink":
+            try:
+                os.link(src, tmp_path)
+                method = "hardlink"
+            except OSError:
+                pass
+        if method == "copy":
+            shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return method
+
+
+def _is_unchanged(src: str, src_stat: os.stat_result, dst: str, checksum: bool) -> bool:
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    if dst_stat.st_ino == src_stat.st_ino and dst_stat.st_dev == src_stat.st_dev:
+        return True
+    if dst_stat.st_size != src_stat.st_size:
+        return False
+    if checksum == True:
+        return file_hash(src) == file_hash(dst)
+    return dst_stat.st_mtime_ns == src_stat.st_mtime_ns
+
+
+def sync_tree(src_dir: str, dst_dir: str, manifest: BuildManifest = None, link: str = "auto", checksum: bool = False, optimizer = None) -> SyncReport:
+    if link not in LINK_MODES:
+        raise ValueError(f"Unknown link mode {link}, expected one of {', '.join(LINK_MODES)}")
+    report = SyncReport()
+    present = set()
+    for dir_path, dir_names, file_names in os.walk(src_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            src = os.path.join(dir_path, file_name)
+            relative = os.path.relpath(src, src_dir)
+            dst = os.path.join(dst_dir, relative)
+            src_stat = os.stat(src)
+            if optimizer != None and optimizer.handles(relative):
+                # Optimized images and their variants come from the optimizer's cache
+                if optimizer.is_unchanged(src, src_stat, dst_dir, relative):
+                    present.update(optimizer.outputs(relative))
+                    report.skipped.append(relative)
+                    report.bytes_skipped += src_stat.st_size
+                    continue
+                present.update(optimizer.sync(src, src_stat, dst_dir, relative, lambda source, target: sync_file(source, target, link)))
+                report.copied.append(relative)
+                report.bytes_copied += src_stat.st_size
+                continue
+            present.add(relative)
+            if _is_unchanged(src, src_stat, dst, checksum):
+                report.skipped.append(relative)
+                report.bytes_skipped += src_stat.st_size
+                continue
+            method = sync_file(src, dst, link)
+            logger.debug("Synced %s to %s (%s)", src, dst, method)
+            report.copied.append(relative)
+            report.bytes_copied += src_stat.st_size
+
+    if optimizer != None:
+        optimizer.retain(present)
+    if manifest != None:
+        # Only files this function put in dst_dir are candidates for removal
+        for relative in sorted(set(manifest.assets) - present):
+            dst = os.path.join(dst_dir, relative)
+            if remove_output(dst, dst_dir):
+                logger.debug("Removed stale static file %s", dst)
+                report.removed.append(relative)
+        manifest.assets = sorted(present)
+    return report
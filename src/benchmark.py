@@ -0,0 +1,260 @@
+from mdparser import *
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+
+def chained_text_to_textnodes(MDtext: str) -> list[TextNode]:
+    # The previous five pass pipeline, kept as the baseline for comparisons
+    if len(MDtext) == 0:
+        return []
+    nodes_list = [TextNode(MDtext, TextType.NORMAL)]
+    nodes_list = split_nodes(nodes_list, "**", TextType.BOLD)
+    nodes_list = split_nodes(nodes_list, "_", TextType.ITALIC)
+    nodes_list = split_nodes(nodes_list, "`", TextType.CODE)
+    nodes_list = split_nodes_image(nodes_list)
+    nodes_list = split_nodes_link(nodes_list)
+    return nodes_list
+
+
+def long_paragraph(sentences: int) -> str:
+    sentence = "Some **bold words** and _italic words_ with `code` plus a [link](https://example.com/page) and ![an image](/images/pic.png). "
+    return sentence * sentences
+
+
+def nested_inline(depth: int) -> str:
+    # Markup inside markup: code inside emphasis inside link text, brackets inside alt text
+    unit = "**bold _with italic_ and `code **not bold**`** [a _link_ with `code`](/x_y_z) ![alt (v2)](/img_1.png) \\_escaped\\_ "
+    return unit * depth
+
+
+def link_dense(links: int) -> str:
+    # Repeated link texts and images, the case the old find based splitting rescanned
+    return "".join(f"see [docs](/docs/{index % 7}) and ![icon](/img/{index % 3}.png), " for index in range(links))
+
+
+def huge_list(items: int) -> str:
+    return "\n".join(f"- item number {index} with **bold** and a [link](/page/{index})" for index in range(items))
+
+
+def big_code_block(lines: int) -> str:
+    body = "\n".join(f"    value_{index} = compute(**kwargs)  # not _markdown_" for index in range(lines))
+    return f"```\n{body}\n```"
+
+
+def document(scale: int) -> str:
+    blocks = []
+    for index in range(scale):
+        blocks.append(f"## Section {index}")
+        blocks.append(long_paragraph(5))
+        blocks.append(huge_list(10))
+        blocks.append("> a quote\n> with **two** lines")
+        blocks.append(big_code_block(10))
+        blocks.append("\n".join(f"{number}. ordered item" for number in range(1, 10)))
+    return "# Benchmark document\n\n" + "\n\n".join(blocks)
+
+
+class Benchmark:
+    def __init__(self, name: str, corpus: str, size: int, input_bytes: int, func, number: int):
+        self.name = name
+        self.corpus = corpus
+        self.size = size
+        self.input_bytes = input_bytes
+        self.func = func
+        self.number = number
+
+    def run(self, repeat: int) -> dict:
+        timings = timeit.repeat(self.func, number=self.number, repeat=repeat)
+        per_call = [timing / self.number for timing in timings]
+        return {
+            "name": self.name,
+            "corpus": self.corpus,
+            "size": self.size,
+            "input_bytes": self.input_bytes,
+            "number": self.number,
+            "repeat": repeat,
+            "min_seconds": min(per_call),
+            "mean_seconds": sum(per_call) / len(per_call),
+        }
+
+
+def make_site(root: str, pages: int) -> tuple[str, str]:
+    content_dir = os.path.join(root, "content")
+    template_path = os.path.join(root, "template.html")
+    os.makedirs(root, exist_ok=True)
+    with open(template_path, "w") as file:
+        file.write("<html><title>{{ Title }}</title><body>{{ Content }}</body></html>")
+    page = document(2)
+    for index in range(pages):
+        section = os.path.join(content_dir, f"section{index % 10}")
+        os.makedirs(section, exist_ok=True)
+        with open(os.path.join(section, f"page{index}.md"), "w") as file:
+            file.write(page)
+    return content_dir, template_path
+
+
+def make_benchmarks(size: int, workdir: str, only: set[str] = None) -> list[Benchmark]:
+    number = lambda nbytes: max(1, 200000 // max(1, nbytes))
+    benchmarks = []
+
+    for corpus, text in (("long_paragraph", long_paragraph(100 * size)), ("nested_inline", nested_inline(50 * size))):
+        benchmarks.append(Benchmark("text_to_textnodes", corpus, size, len(text), lambda text=text: text_to_textnodes(text), number(len(text))))
+        benchmarks.append(Benchmark("chained_text_to_textnodes", corpus, size, len(text), lambda text=text: chained_text_to_textnodes(text), number(len(text))))
+
+    links = link_dense(200 * size)
+    benchmarks.append(Benchmark("split_nodes_image_link", "link_dense", size, len(links),
+                                lambda: split_nodes_link(split_nodes_image([TextNode(links, TextType.NORMAL)])), number(len(links))))
+    benchmarks.append(Benchmark("text_to_textnodes", "link_dense", size, len(links), lambda: text_to_textnodes(links), number(len(links))))
+
+    doc = document(10 * size)
+    benchmarks.append(Benchmark("markdown_to_blocks", "document", size, len(doc), lambda: markdown_to_blocks(doc), number(len(doc))))
+
+    for corpus, block in (("paragraph", long_paragraph(20 * size)), ("huge_list", huge_list(200 * size)), ("big_code_block", big_code_block(200 * size))):
+        benchmarks.append(Benchmark("block_to_block_type", corpus, size, len(block), lambda block=block: block_to_block_type(block), number(len(block)) * 10))
+
+    for corpus, text in (("document", doc), ("huge_list", huge_list(200 * size)), ("big_code_block", big_code_block(200 * size))):
+        benchmarks.append(Benchmark("markdown_to_html_node", corpus, size, len(text), lambda text=text: markdown_to_html_node(text), number(len(text))))
+
+    node = markdown_to_html_node(doc)
+    benchmarks.append(Benchmark("to_html", "document", size, len(doc), node.to_html, number(len(doc))))
+
+    # Building the test site is slow, so it is skipped unless its benchmark was asked for
+    if only != None and "generate_pages_recursive" not in only:
+        return benchmarks
+    pages = 100 * size
+    site_root = os.path.join(workdir, f"site{size}")
+    content_dir, template_path = make_site(site_root, pages)
+    dest_dir = os.path.join(site_root, "docs")
+    site_bytes = pages * len(document(2))
+    benchmarks.append(Benchmark("generate_pages_recursive", f"{pages}_pages", size, site_bytes,
+                                lambda: generate_pages_recursive(content_dir, template_path, dest_dir, "/"), 1))
+    return benchmarks
+
+
+def measure_tree_memory(size: int) -> dict:
+    # Bytes still held by the parsed node tree of a large page once parsing is done
+    doc = document(10 * size)
+    tracemalloc.start()
+    node = markdown_to_html_node(doc)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    nodes = 0
+    pending = [node]
+    while len(pending) != 0:
+        nodes += 1
+        children = pending.pop().children
+        if children != None:
+            pending.extend(children)
+    return {"corpus": "document", "size": size, "input_bytes": len(doc), "nodes": nodes, "tree_bytes": current, "peak_bytes": peak}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes: list[int], repeat: int = 3, only: list[str] = None) -> dict:
+    # only holds exact benchmark names; "memory" selects the tree memory measurement
+    only = set(only) if only != None else None
+    results = []
+    memory = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            for benchmark in make_benchmarks(size, workdir, only):
+                if only != None and benchmark.name not in only:
+                    continue
+                results.append(benchmark.run(repeat))
+            if only == None or "memory" in only:
+                memory.append(measure_tree_memory(size))
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "sizes": sizes,
+        },
+        "results": results,
+        "memory": memory,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[dict]:
+    # Ratio above 1 means the current run is slower than the baseline
+    previous = {(result["name"], result["corpus"], result["size"]): result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = previous.get((result["name"], result["corpus"], result["size"]))
+        if old == None:
+            continue
+        ratio = result["min_seconds"] / old["min_seconds"] if old["min_seconds"] > 0 else float("inf")
+        rows.append({
+            "name": result["name"],
+            "corpus": result["corpus"],
+            "size": result["size"],
+            "baseline_seconds": old["min_seconds"],
+            "current_seconds": result["min_seconds"],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold,
+        })
+    return rows
+
+
+def print_results(suite: dict):
+    print(f"{'benchmark':<28} {'corpus':<16} {'size':>5} {'bytes':>10} {'min (ms)':>11} {'MB/s':>8}")
+    for result in suite["results"]:
+        throughput = result["input_bytes"] / result["min_seconds"] / 1e6 if result["min_seconds"] > 0 else 0
+        print(f"{result['name']:<28} {result['corpus']:<16} {result['size']:>5} {result['input_bytes']:>10} {result['min_seconds'] * 1000:>11.3f} {throughput:>8.2f}")
+
+
+def print_memory(suite: dict):
+    print(f"{'tree memory':<28} {'corpus':<16} {'size':>5} {'nodes':>10} {'KiB':>11} {'B/node':>8}")
+    for entry in suite["memory"]:
+        print(f"{'':<28} {entry['corpus']:<16} {entry['size']:>5} {entry['nodes']:>10} {entry['tree_bytes'] / 1024:>11.1f} {entry['tree_bytes'] / entry['nodes']:>8.1f}")
+
+
+def print_comparison(rows: list[dict]):
+    print(f"{'benchmark':<28} {'corpus':<16} {'size':>5} {'baseline (ms)':>14} {'current (ms)':>13} {'ratio':>7}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:<28} {row['corpus']:<16} {row['size']:>5} {row['baseline_seconds'] * 1000:>14.3f} {row['current_seconds'] * 1000:>13.3f} {row['ratio']:>6.2f}x{flag}")
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Markdown to HTML pipeline on synthetic corpora")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16], help="corpus scale factors (default: 1 4 16)")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions, the best one is kept (default: 3)")
+    parser.add_argument("--only", action="append", metavar="NAME", help="only run the benchmark with this name, can be repeated; memory selects the tree memory measurement")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown ratio reported as a regression (default: 0.10)")
+    args = parser.parse_args(sys.argv[1:] if argv == None else argv)
+
+    suite = run_suite(args.sizes, args.repeat, args.only)
+    print_results(suite)
+    if len(suite["memory"]) != 0:
+        print()
+        print_memory(suite)
+    if args.output != None:
+        with open(args.output, "w") as file:
+            json.dump(suite, file, indent=1)
+    if args.compare != None:
+        with open(args.compare) as file:
+            rows = compare(json.load(file), suite, args.threshold)
+        print()
+        print_comparison(rows)
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+LOGGER_NAME = "static_generator"
+LEVELS = {
+    "quiet": logging.WARNING,
+    "info": logging.INFO,
+    "debug": logging.DEBUG,
+}
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure(level: str = "info", json_lines: bool = False, stream = None):
+    handler = logging.StreamHandler(sys.stdout if stream == None else stream)
+    if json_lines == True:
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.handlers = [handler]
+    logger.setLevel(LEVELS[level])
+    logger.propagate = False
+
+
+def debug_enabled() -> bool:
+    return logger.isEnabledFor(logging.DEBUG)
+
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        logger.info("%s took %.3fs", name, elapsed, extra={"fields": {"phase": name, "seconds": round(elapsed, 6)}})
@@ -0,0 +1,150 @@
+from manifest import BuildManifest, remove_output
+from writer import write_output
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = (".html", ".htm", ".css", ".js", ".mjs", ".json", ".xml", ".svg", ".txt", ".map", ".ico", ".wasm")
+DEFAULT_MIN_SIZE = 1024
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 keeps the output identical between builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+
+def available_formats() -> dict:
+    formats = {".gz": _gzip}
+    if brotli != None:
+        formats[".br"] = _brotli
+    return formats
+
+
+class CompressReport:
+    def __init__(self):
+        self.compressed = []
+        self.skipped = []
+        self.removed = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def counts(self) -> dict:
+        return {
+            "compressed": len(self.compressed),
+            "skipped": len(self.skipped),
+            "removed": len(self.removed),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+    def summary(self) -> str:
+        return "Precompressed: {compressed} variants ({bytes_in} to {bytes_out} bytes), {skipped} up to date, {removed} removed".format(**self.counts())
+
+
+def _is_up_to_date(stat: os.stat_result, variant: str) -> bool:
+    # A variant is stamped with the mtime of its source when it is written
+    try:
+        return os.stat(variant).st_mtime_ns == stat.st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def compress_file(path: str, suffixes: list[str]) -> tuple[list[tuple[str, int, int]], list[tuple[str, int]]]:
+    # Writes the given variants of path and returns (variant, source bytes, variant bytes)
+    # for each one written. A variant that is not smaller than its source is removed instead,
+    # and returned with the mtime of the source in the second list
+    formats = available_formats()
+    stat = os.stat(path)
+    with open(path, "rb") as file:
+        data = file.read()
+    written = []
+    incompressible = []
+    for suffix in suffixes:
+        variant = path + suffix
+        compressed = formats[suffix](data)
+        if len(compressed) >= len(data):
+            if os.path.exists(variant):
+                os.remove(variant)
+            incompressible.append((variant, stat.st_mtime_ns))
+            continue
+        write_output(variant, compressed)
+        os.utime(variant, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        written.append((variant, len(data), len(compressed)))
+    return written, incompressible
+
+
+def _compress_task(task: tuple[str, list[str]]) -> tuple[list[tuple[str, int, int]], list[tuple[str, int]]]:
+    return compress_file(*task)
+
+
+def precompress_tree(root: str, manifest: BuildManifest = None, min_size: int = DEFAULT_MIN_SIZE, jobs: int = 1) -> CompressReport:
+    # Adds .gz (and .br when brotli is installed) siblings next to every compressible file
+    # of at least min_size bytes. With a manifest, variants written by an earlier run whose
+    # source is gone, too small or no longer compressed are removed, and variants that did
+    # not come out smaller are remembered, so their source is not compressed again until it changes
+    report = CompressReport()
+    incompressible = {}
+    known = manifest.incompressible if manifest != None else {}
+    suffixes = list(available_formats())
+    sources = {}
+    for dir_path, dir_names, file_names in os.walk(root):
+        for file_name in file_names:
+            if file_name.lower().endswith(COMPRESSIBLE_SUFFIXES):
+                path = os.path.join(dir_path, file_name)
+                stat = os.stat(path)
+                if stat.st_size >= min_size:
+                    sources[path] = stat
+
+    tasks = []
+    for path in sorted(sources):
+        stale = []
+        for suffix in suffixes:
+            relative = os.path.relpath(path + suffix, root)
+            if known.get(relative) == sources[path].st_mtime_ns:
+                incompressible[relative] = sources[path].st_mtime_ns
+            elif _is_up_to_date(sources[path], path + suffix):
+                report.skipped.append(path + suffix)
+            else:
+                stale.append(suffix)
+        if len(stale) != 0:
+            tasks.append((path, stale))
+
+    if jobs > 1 and len(tasks) > 1:
+        workers = min(jobs, len(tasks))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_compress_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [_compress_task(task) for task in tasks]
+    for written, not_smaller in results:
+        for variant, bytes_in, bytes_out in written:
+            report.compressed.append(variant)
+            report.bytes_in += bytes_in
+            report.bytes_out += bytes_out
+        for variant, mtime_ns in not_smaller:
+            incompressible[os.path.relpath(variant, root)] = mtime_ns
+
+    if manifest != None:
+        present = set(os.path.relpath(variant, root) for variant in report.compressed + report.skipped)
+        report.removed = remove_variants(root, manifest, present)
+        manifest.incompressible = incompressible
+    return report
+
+
+def remove_variants(root: str, manifest: BuildManifest, keep: set[str] = frozenset()) -> list[str]:
+    # Only variants recorded in the manifest are removed, never files that came from static/
+    removed = []
+    for relative in sorted(set(manifest.variants) - keep):
+        variant = os.path.join(root, relative)
+        if remove_output(variant, root):
+            removed.append(variant)
+    manifest.variants = sorted(keep)
+    return removed
@@ -0,0 +1,254 @@
+from buildlog import logger
+from discovery import ContentFilter
+from mdparser import parse_page
+from metadata import MetadataIndex
+from template import compile_template
+from watch import PollingWatcher
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlsplit
+import os
+import threading
+import time
+
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_TIMEOUT = 25
+LIVE_RELOAD_SCRIPT = """<script>
+(function poll(version) {
+    fetch("%s?version=" + version).then(function (response) { return response.text(); }).then(function (latest) {
+        if (version !== "" && latest !== version) { location.reload(); return; }
+        poll(latest);
+    }).catch(function () { setTimeout(function () { poll(version); }, 1000); });
+})("");
+</script>
+""" % LIVE_RELOAD_PATH
+
+
+class DevSite:
+    # Renders pages on demand and keeps them in memory until their sources change.
+    # Only the pages a build would make are found: those the content filter accepts and,
+    # with a metadata index, no drafts unless drafts is set
+    def __init__(self, content_dir: str, static_dir: str, template_path: str, metadata: MetadataIndex = None, drafts: bool = False, content_filter: ContentFilter = None):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.content_filter = content_filter if content_filter != None else ContentFilter(content_dir)
+        self.metadata = metadata
+        self.drafts = drafts
+        self._metadata_lock = threading.Lock()
+        self.version = 0
+        self.closed = False
+        self.changed = threading.Condition()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    def find_page(self, url_path: str) -> str:
+        relative = unquote(url_path).strip("/")
+        if relative.endswith(".html"):
+            relative = relative[:-5]
+        if relative == "":
+            candidates = ["index.md"]
+        elif relative == "index" or relative.endswith("/index"):
+            candidates = [relative + ".md"]
+        else:
+            candidates = [relative + "/index.md", relative + ".md"]
+        root = os.path.realpath(self.content_dir)
+        for candidate in candidates:
+            path = os.path.realpath(os.path.join(root, candidate))
+            if path.startswith(root + os.sep) and os.path.isfile(path):
+                relative = os.path.relpath(path, root).replace(os.sep, "/")
+                if self.content_filter.accepts(relative) == False:
+                    return None
+                return path if self.is_published(path) else None
+        return None
+
+    def is_published(self, path: str) -> bool:
+        if self.metadata == None or self.drafts == True:
+            return True
+        try:
+            with self._metadata_lock:
+                return self.metadata.get(path)["draft"] == False
+        except ValueError:
+            # Rendering reports the broken front matter
+            return True
+
+    def _signature(self, path: str) -> tuple:
+        page_stat = os.stat(path)
+        template_stat = os.stat(self.template_path)
+        return (page_stat.st_mtime_ns, page_stat.st_size, template_stat.st_mtime_ns, template_stat.st_size)
+
+    def render(self, path: str) -> bytes:
+        signature = self._signature(path)
+        with self._cache_lock:
+            cached = self._cache.get(path)
+        if cached != None and cached[0] == signature:
+            return cached[1]
+        title, content_node = parse_page(path)
+        html = compile_template(self.template_path, "/").render({"Title": title, "Content": content_node})
+        head, body_end, tail = html.rpartition("</body>")
+        if body_end == "":
+            html = html + LIVE_RELOAD_SCRIPT
+        else:
+            html = head + LIVE_RELOAD_SCRIPT + body_end + tail
+        data = html.encode("utf-8")
+        with self._cache_lock:
+            self._cache[path] = (signature, data)
+        return data
+
+    def invalidate(self, changes: set[str]):
+        if self.content_filter.ignore_path in changes:
+            self.content_filter.reload()
+        with self._cache_lock:
+            if self.template_path in changes:
+                self._cache.clear()
+            else:
+                for path in changes:
+                    self._cache.pop(os.path.realpath(path), None)
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version or self.closed, timeout)
+            return self.version
+
+    def close(self):
+        # Releases the live reload requests that are still waiting
+        with self.changed:
+            self.closed = True
+            self.changed.notify_all()
+
+    def watch(self, interval: float, should_stop):
+        watcher = PollingWatcher([self.content_dir, self.static_dir, self.template_path])
+        while should_stop() == False:
+            changes = watcher.poll()
+            if len(changes) != 0:
+                logger.info("Changed: %s", ", ".join(sorted(changes)))
+                self.invalidate(changes)
+            time.sleep(interval)
+
+
+class DevRequestHandler(SimpleHTTPRequestHandler):
+    # Pages come from DevSite, anything else is served straight from the static directory
+    def __init__(self, *args, site: DevSite, **kwargs):
+        self.site = site
+        super().__init__(*args, directory=site.static_dir, **kwargs)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def _respond(self, send_body: bool):
+        url = urlsplit(self.path)
+        if url.path == LIVE_RELOAD_PATH:
+            self._live_reload(parse_qs(url.query).get("version", [""])[0], send_body)
+            return
+        page = self.site.find_page(url.path)
+        if page == None:
+            if send_body == True:
+                super().do_GET()
+            else:
+                super().do_HEAD()
+            return
+        try:
+            data = self.site.render(page)
+        except Exception as error:
+            logger.error("Failed to render %s: %s", page, error)
+            self.send_error(500, f"Failed to render {page}: {error}")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if send_body == True:
+            self.wfile.write(data)
+
+    def _version_response(self, version: str, send_body: bool) -> bytes:
+        data = version.encode("utf-8")
+        head = (f"{self.protocol_version} 200 OK\r\nContent-Type: text/plain\r\nContent-Length: {len(data)}\r\n"
+                "Cache-Control: no-store\r\nConnection: close\r\n\r\n")
+        return head.encode("latin-1") + (data if send_body == True else b"")
+
+    def _live_reload(self, version: str, send_body: bool = True):
+        current = str(self.site.version)
+        self.close_connection = True
+        if version != current or send_body == False:
+            self.wfile.write(self._version_response(current, send_body))
+            return
+        # Waiting for a change takes up to LIVE_RELOAD_TIMEOUT seconds, so the connection is
+        # answered from a thread of its own and every open tab does not hold a request thread
+        request = self.request
+
+        def respond():
+            latest = str(self.site.wait_for_change(int(current), LIVE_RELOAD_TIMEOUT))
+            request.sendall(self._version_response(latest, True))
+
+        self.server.detach(request, respond)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    # Requests are handled by a fixed pool of threads. A handler that would wait a long time
+    # detaches its connection instead: it is answered and closed on a thread of its own
+    def __init__(self, address: tuple[str, int], handler, workers: int = 16):
+        super().__init__(address, handler)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._detached = {}
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request, request, client_address)
+
+    def detach(self, request, respond):
+        # respond is called once the handler has returned; the connection is closed after it
+        self._detached[request] = respond
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            respond = self._detached.pop(request, None)
+            if respond == None:
+                self.shutdown_request(request)
+            else:
+                threading.Thread(target=self._respond_detached, args=(request, respond), daemon=True).start()
+
+    def _respond_detached(self, request, respond):
+        try:
+            respond()
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_server(site: DevSite, host: str = "localhost", port: int = 8888, workers: int = 16) -> ThreadPoolHTTPServer:
+    handler = lambda *args, **kwargs: DevRequestHandler(*args, site=site, **kwargs)
+    return ThreadPoolHTTPServer((host, port), handler, workers)
+
+
+def serve(site: DevSite, host: str = "localhost", port: int = 8888, interval: float = 0.5):
+    server = make_server(site, host, port)
+    stopped = threading.Event()
+    watcher = threading.Thread(target=site.watch, args=(interval, stopped.is_set), daemon=True)
+    watcher.start()
+    logger.info("Serving %s on http://%s:%d/, press Ctrl+C to stop", site.content_dir, host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopped.set()
+        site.close()
+        server.server_close()
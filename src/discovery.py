@@ -0,0 +1,87 @@
+from collections.abc import Iterator
+from fnmatch import fnmatchcase
+import os
+
+IGNORE_FILE = ".contentignore"
+DEFAULT_INCLUDE = ("*.md",)
+TEMP_SUFFIXES = ("~", ".swp", ".swo", ".swx", ".tmp", ".bak", ".orig")
+
+
+def is_hidden_or_temp(name: str) -> bool:
+    # Dotfiles, editor swap and backup files, and emacs autosave (#name#) or lock (.#name) files
+    return name.startswith(".") or name.startswith("#") or name.endswith(TEMP_SUFFIXES)
+
+
+def read_ignore_file(path: str) -> list[str]:
+    patterns = []
+    try:
+        with open(path) as file:
+            for line in file:
+                line = line.strip()
+                if line != "" and line.startswith("#") == False:
+                    patterns.append(line)
+    except FileNotFoundError:
+        pass
+    return patterns
+
+
+def _matches(relative: str, name: str, patterns: list[str], is_dir: bool = False) -> bool:
+    # A pattern with a slash is matched against the path relative to the root, one
+    # without against the name alone, and a trailing slash only matches directories,
+    # the way .gitignore patterns work
+    for pattern in patterns:
+        if pattern.endswith("/") and is_dir == False:
+            continue
+        if "/" in pattern.rstrip("/"):
+            if fnmatchcase(relative, pattern.strip("/")):
+                return True
+        elif fnmatchcase(name, pattern.rstrip("/")):
+            return True
+    return False
+
+
+class ContentFilter:
+    # Decides which files under root are pages: they must match an include glob and no
+    # exclude glob, including those read from the ignore file at the top of root
+    def __init__(self, root: str, include: list[str] = None, exclude: list[str] = None, ignore_file: str = IGNORE_FILE):
+        self.root = root
+        self.include = list(include) if include else list(DEFAULT_INCLUDE)
+        self.exclude = list(exclude or [])
+        self.ignore_path = os.path.join(root, ignore_file) if ignore_file != None else None
+        self.reload()
+
+    def reload(self):
+        self.ignored = read_ignore_file(self.ignore_path) if self.ignore_path != None else []
+
+    def _excluded(self, relative: str, name: str, is_dir: bool = False) -> bool:
+        return is_hidden_or_temp(name) or _matches(relative, name, self.exclude, is_dir) or _matches(relative, name, self.ignored, is_dir)
+
+    def relative(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def accepts_dir(self, relative: str) -> bool:
+        return self._excluded(relative, relative.rsplit("/", 1)[-1], True) == False
+
+    def accepts(self, relative: str) -> bool:
+        parts = relative.split("/")
+        for index in range(1, len(parts)):
+            if self.accepts_dir("/".join(parts[:index])) == False:
+                return False
+        return self._excluded(relative, parts[-1]) == False and _matches(relative, parts[-1], self.include)
+
+    def walk(self) -> Iterator[os.DirEntry]:
+        # Lazily yields the accepted files; excluded directories are never entered and
+        # the DirEntry objects keep the stat results scandir already has
+        pending = [(self.root, "")]
+        while len(pending) != 0:
+            directory, prefix = pending.pop()
+            with os.scandir(directory) as entries:
+                subdirs = []
+                for entry in entries:
+                    relative = prefix + entry.name
+                    if entry.is_dir():
+                        if self.accepts_dir(relative):
+                            subdirs.append((entry.path, relative + "/"))
+                    elif self._excluded(relative, entry.name) == False and _matches(relative, entry.name, self.include):
+                        yield entry
+            pending.extend(reversed(subdirs))
@@ -0,0 +1,167 @@
+from metadata import MetadataIndex, parse_date
+from writer import write_stream
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+import heapq
+import itertools
+import os
+
+SITEMAP_FILE = "sitemap.xml"
+FEED_FILE = "feed.xml"
+# Most URLs a single sitemap file may list; larger sites get a sitemap index
+SITEMAP_MAX_URLS = 50000
+DEFAULT_FEED_SECTION = "blog"
+DEFAULT_FEED_ENTRIES = 20
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+ATTRIBUTE_ENTITIES = {"\"": "&quot;"}
+
+
+def page_path(relative: str) -> str:
+    # relative is the path of the page below the content directory; index pages are
+    # addressed by their directory, the way the site links to them
+    path = os.path.splitext(relative.replace(os.sep, "/"))[0]
+    if path == "index":
+        return ""
+    if path.endswith("/index"):
+        return path[:-5]
+    return path + ".html"
+
+
+def page_url(site_url: str, basepath: str, relative: str) -> str:
+    return site_url.rstrip("/") + basepath + page_path(relative)
+
+
+def w3c_datetime(mtime_ns: int) -> str:
+    return datetime.fromtimestamp(mtime_ns // 1_000_000_000, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def metadata_datetime(date: str) -> str:
+    return parse_date(date).astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FeedReport:
+    def __init__(self):
+        self.written = []
+        self.unchanged = []
+        self.removed = []
+        self.urls = 0
+        self.entries = 0
+
+    def counts(self) -> dict:
+        return {
+            "urls": self.urls,
+            "entries": self.entries,
+            "written": len(self.written),
+            "unchanged": len(self.unchanged),
+            "removed": len(self.removed),
+        }
+
+    def summary(self) -> str:
+        return "Feeds: {urls} sitemap URLs, {entries} feed entries, {written} files written, {unchanged} unchanged, {removed} removed".format(**self.counts())
+
+
+def iter_sitemap(urls: Iterable[tuple[str, str]]) -> Iterator[str]:
+    # urls yields (loc, lastmod); lastmod may be None
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NAMESPACE}">\n'
+    for loc, lastmod in urls:
+        if lastmod == None:
+            yield f"<url><loc>{escape(loc)}</loc></url>\n"
+        else:
+            yield f"<url><loc>{escape(loc)}</loc><lastmod>{lastmod}</lastmod></url>\n"
+    yield "</urlset>\n"
+
+
+def iter_sitemap_index(sitemaps: Iterable[str]) -> Iterator[str]:
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n'
+    for loc in sitemaps:
+        yield f"<sitemap><loc>{escape(loc)}</loc></sitemap>\n"
+    yield "</sitemapindex>\n"
+
+
+def iter_atom_feed(feed_id: str, title: str, updated: str, entries: Iterable[dict]) -> Iterator[str]:
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="{ATOM_NAMESPACE}">\n'
+    yield f"<id>{escape(feed_id)}</id>\n<title>{escape(title)}</title>\n<updated>{updated}</updated>\n"
+    yield f"<author><name>{escape(title)}</name></author>\n"
+    yield f'<link rel="self" href="{escape(feed_id + FEED_FILE, ATTRIBUTE_ENTITIES)}"/>\n<link href="{escape(feed_id, ATTRIBUTE_ENTITIES)}"/>\n'
+    for entry in entries:
+        yield f"<entry><id>{escape(entry['url'])}</id><title>{escape(entry['title'])}</title>"
+        yield f"<updated>{entry['updated']}</updated>"
+        if entry["published"] != None:
+            yield f"<published>{entry['published']}</published>"
+        yield f'<link href="{escape(entry["url"], ATTRIBUTE_ENTITIES)}"/>'
+        for tag in entry["tags"]:
+            yield f'<category term="{escape(tag, ATTRIBUTE_ENTITIES)}"/>'
+        yield "</entry>\n"
+    yield "</feed>\n"
+
+
+def _feed_entry(url: str, meta: dict, modified: int) -> dict:
+    published = metadata_datetime(meta["date"]) if meta["date"] != None else None
+    return {
+        "url": url,
+        "title": meta["title"] or url,
+        "updated": published or w3c_datetime(modified),
+        "published": published,
+        "tags": meta["tags"],
+    }
+
+
+def write_site_feeds(content_dir: str, dest_dir: str, basepath: str, site_url: str, pages: list[str], metadata: MetadataIndex,
+                     feed_section: str = DEFAULT_FEED_SECTION, feed_entries: int = DEFAULT_FEED_ENTRIES) -> FeedReport:
+    # Writes sitemap.xml for every page and an Atom feed of the newest pages in feed_section.
+    # Everything comes from the metadata index, which only reads the pages that changed.
+    # URLs are produced while the XML streams to disk and the feed keeps a bounded heap,
+    # so memory does not grow with the number of pages; unchanged files are left alone
+    report = FeedReport()
+    report.urls = len(pages)
+    root_url = site_url.rstrip("/") + basepath
+    section = feed_section.strip("/") + "/"
+    newest = []
+    site = {"title": None}
+
+    def sitemap_urls() -> Iterator[tuple[str, str]]:
+        for source in sorted(pages):
+            relative = os.path.relpath(source, content_dir).replace(os.sep, "/")
+            url = page_url(site_url, basepath, relative)
+            modified = metadata.modified(source)
+            if relative == "index.md":
+                site["title"] = metadata.get(source)["title"]
+            elif relative.startswith(section) and relative != section + "index.md" and feed_entries > 0:
+                entry = _feed_entry(url, metadata.get(source), modified)
+                item = ((entry["updated"], url), entry)
+                if len(newest) < feed_entries:
+                    heapq.heappush(newest, item)
+                else:
+                    heapq.heappushpop(newest, item)
+            yield url, w3c_datetime(modified)
+
+    def write(name: str, chunks: Iterator[str]):
+        path = os.path.join(dest_dir, name)
+        if write_stream(path, chunks):
+            report.written.append(path)
+        else:
+            report.unchanged.append(path)
+
+    os.makedirs(dest_dir, exist_ok=True)
+    urls = sitemap_urls()
+    parts = 0
+    if len(pages) <= SITEMAP_MAX_URLS:
+        write(SITEMAP_FILE, iter_sitemap(urls))
+    else:
+        parts = (len(pages) + SITEMAP_MAX_URLS - 1) // SITEMAP_MAX_URLS
+        for part in range(1, parts + 1):
+            write(f"sitemap-{part}.xml", iter_sitemap(itertools.islice(urls, SITEMAP_MAX_URLS)))
+        write(SITEMAP_FILE, iter_sitemap_index(f"{root_url}sitemap-{part}.xml" for part in range(1, parts + 1)))
+    # Parts left over from an earlier, larger build
+    while os.path.exists(os.path.join(dest_dir, f"sitemap-{parts + 1}.xml")):
+        parts += 1
+        report.removed.append(os.path.join(dest_dir, f"sitemap-{parts}.xml"))
+        os.remove(report.removed[-1])
+
+    entries = [entry for key, entry in sorted(newest, key=lambda item: item[0], reverse=True)]
+    report.entries = len(entries)
+    updated = entries[0]["updated"] if len(entries) != 0 else w3c_datetime(0)
+    write(FEED_FILE, iter_atom_feed(root_url, site["title"] or root_url, updated, entries))
+    return report
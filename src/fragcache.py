@@ -0,0 +1,123 @@
+from manifest import GENERATOR_VERSION
+from collections import OrderedDict
+import hashlib
+import os
+import shutil
+
+FRAGMENT_CACHE_DIR = "fragments"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MEMORY_ENTRIES = 4096
+
+_open_caches = {}
+
+
+class FragmentCache:
+    # Rendered HTML of single blocks, keyed by a hash of the block type and source lines.
+    # Entries live in an in-memory LRU in front of an optional on-disk store that is
+    # namespaced by the generator version, so a new version never reads old fragments.
+    def __init__(self, directory: str = None, max_bytes: int = DEFAULT_MAX_BYTES, memory_entries: int = DEFAULT_MEMORY_ENTRIES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+
+    def config(self) -> tuple:
+        return (self.directory, self.max_bytes, self.memory_entries)
+
+    def version_dir(self) -> str:
+        return os.path.join(self.directory, f"v{GENERATOR_VERSION}")
+
+    def key(self, block_type, lines: list[str], salt: str = "") -> str:
+        # salt holds anything else the rendered block depends on
+        digest = hashlib.sha256(f"{GENERATOR_VERSION}\0{block_type.name}\0{salt}\0".encode("utf-8"))
+        for line in lines:
+            digest.update(line.encode("utf-8"))
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.version_dir(), key[:2], key[2:] + ".html")
+
+    def get(self, key: str) -> str:
+        html = self._memory.get(key)
+        if html != None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return html
+        if self.directory != None:
+            path = self._path(key)
+            try:
+                with open(path, encoding="utf-8") as file:
+                    html = file.read()
+                os.utime(path)
+            except OSError:
+                html = None
+            if html != None:
+                self._remember(key, html)
+                self.hits += 1
+                return html
+        self.misses += 1
+        return None
+
+    def put(self, key: str, html: str):
+        self._remember(key, html)
+        if self.directory == None:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(html)
+        os.replace(tmp_path, path)
+
+    def _remember(self, key: str, html: str):
+        self._memory[key] = html
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def trim(self) -> int:
+        # Drops other generator versions, then the least recently used files above max_bytes
+        if self.directory == None or os.path.isdir(self.directory) == False:
+            return 0
+        current = f"v{GENERATOR_VERSION}"
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and entry.name != current:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        files = []
+        total = 0
+        for dir_path, dir_names, file_names in os.walk(self.version_dir()):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+        removed = 0
+        if total <= self.max_bytes:
+            return removed
+        target = self.max_bytes * 0.9
+        for mtime, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def open_fragment_cache(directory: str = None, max_bytes: int = DEFAULT_MAX_BYTES, memory_entries: int = DEFAULT_MEMORY_ENTRIES) -> FragmentCache:
+    # One cache per process and configuration, so worker processes keep their LRU between pages
+    config = (directory, max_bytes, memory_entries)
+    cache = _open_caches.get(config)
+    if cache == None:
+        cache = FragmentCache(directory, max_bytes, memory_entries)
+        _open_caches[config] = cache
+    return cache
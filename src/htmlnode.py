@@ -1,15 +1,25 @@
 
+import sys
+
+
 class HTMLNode():
+    # Slots instead of a per-instance __dict__: pages build tens of thousands of nodes
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag = None, value = None, children = None, props = None):
         if value == None and children == None:
             raise ValueError("A leat, each HTMLNode need to either, a value or a children, or both")
-        self.tag = tag
+        self.tag = sys.intern(tag) if type(tag) == str else tag
         self.value = value
         self.children = children
         self.props = props
 
     def to_html(self):
         raise NotImplementedError()
+
+    def render_to(self, write):
+        # Streams the HTML through write(str) so callers can send it straight to a file
+        write(self.to_html())
     
     def props_to_html(self):
         if self.props == None:
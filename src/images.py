@@ -0,0 +1,265 @@
+from buildlog import logger
+from manifest import GENERATOR_VERSION, file_hash, remove_output
+from template import with_basepath
+from writer import write_output
+import hashlib
+import io
+import json
+import os
+import struct
+import zlib
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+IMAGE_CACHE_DIR = "images"
+IMAGE_INDEX_FILE = "index.json"
+# Text and timestamp chunks carry no pixels; iDOT points into the old IDAT layout
+DROPPED_CHUNKS = {b"tEXt", b"zTXt", b"iTXt", b"tIME", b"iDOT"}
+
+_open_indexes = {}
+
+
+def iter_png_chunks(data: bytes):
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError("Not a PNG file")
+    position = 8
+    while position + 8 <= len(data):
+        length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+        yield chunk_type, data[position + 8:position + 8 + length]
+        position += 12 + length
+        if chunk_type == b"IEND":
+            break
+
+
+def png_size(data: bytes) -> tuple[int, int]:
+    for chunk_type, chunk in iter_png_chunks(data):
+        if chunk_type == b"IHDR":
+            return struct.unpack(">II", chunk[:8])
+    raise ValueError("PNG without IHDR chunk")
+
+
+def _png_chunk(chunk_type: bytes, chunk: bytes) -> bytes:
+    return struct.pack(">I4s", len(chunk), chunk_type) + chunk + struct.pack(">I", zlib.crc32(chunk_type + chunk))
+
+
+def optimize_png(data: bytes) -> bytes:
+    # Lossless: the decoded scanlines are untouched, only deflated again at the highest
+    # level with the better of two strategies, and metadata chunks are dropped
+    chunks = list(iter_png_chunks(data))
+    scanlines = zlib.decompress(b"".join(chunk for chunk_type, chunk in chunks if chunk_type == b"IDAT"))
+    best = None
+    for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        compressed = compressor.compress(scanlines) + compressor.flush()
+        if best == None or len(compressed) < len(best):
+            best = compressed
+    output = [PNG_SIGNATURE]
+    for chunk_type, chunk in chunks:
+        if chunk_type in DROPPED_CHUNKS:
+            continue
+        if chunk_type == b"IDAT":
+            if best != None:
+                output.append(_png_chunk(b"IDAT", best))
+                best = None
+            continue
+        output.append(_png_chunk(chunk_type, chunk))
+    optimized = b"".join(output)
+    return optimized if len(optimized) < len(data) else data
+
+
+def resize_png(data: bytes, width: int) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        output = io.BytesIO()
+        resized.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def variant_path(relative: str, width: int) -> str:
+    stem, extension = os.path.splitext(relative)
+    return f"{stem}-{width}w{extension}"
+
+
+class ImageOptimizer:
+    # Optimized images and their resized variants are stored in cache_dir by the hash of the
+    # source, so an image is processed once no matter how often it is synced. The index also
+    # remembers each source's (mtime, size, hash), so unchanged files are not even hashed
+    def __init__(self, cache_dir: str, widths: list[int] = ()):
+        self.cache_dir = cache_dir
+        self.widths = sorted(set(widths))
+        self.index_path = os.path.join(cache_dir, IMAGE_INDEX_FILE)
+        self.sources = {}
+        self.results = {}
+        self.images = {}
+        self.processed = []
+        if len(self.widths) != 0 and Image == None:
+            logger.warning("Pillow is not installed, resized image variants are skipped")
+            self.widths = []
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("generator") != GENERATOR_VERSION:
+            return
+        self.sources = data.get("sources", {})
+        self.results = data.get("results", {})
+        self.images = data.get("images", {})
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data = {"generator": GENERATOR_VERSION, "sources": self.sources, "results": self.results, "images": self.images}
+        write_output(self.index_path, json.dumps(data, indent=1, sort_keys=True).encode("utf-8"))
+
+    def handles(self, relative: str) -> bool:
+        return relative.lower().endswith(".png")
+
+    def _cache_file(self, digest: str, width: int = None) -> str:
+        name = digest if width == None else f"{digest}-{width}w"
+        return os.path.join(self.cache_dir, name + ".png")
+
+    def _source_hash(self, src: str, stat: os.stat_result) -> str:
+        signature = [stat.st_mtime_ns, stat.st_size]
+        cached = self.sources.get(src)
+        if cached != None and cached[:2] == signature:
+            return cached[2]
+        digest = file_hash(src)
+        self.sources[src] = signature + [digest]
+        return digest
+
+    def process(self, src: str, stat: os.stat_result) -> tuple[str, dict]:
+        digest = self._source_hash(src, stat)
+        key = f"{digest}:{','.join(str(width) for width in self.widths)}"
+        result = self.results.get(key)
+        if result != None and all(os.path.exists(self._cache_file(digest, width)) for width in [None] + result["widths"]):
+            return digest, result
+        with open(src, "rb") as file:
+            data = file.read()
+        width, height = png_size(data)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_output(self._cache_file(digest), optimize_png(data))
+        result = {"width": width, "height": height, "widths": []}
+        for variant_width in self.widths:
+            if variant_width < width:
+                write_output(self._cache_file(digest, variant_width), resize_png(data, variant_width))
+                result["widths"].append(variant_width)
+        self.results[key] = result
+        self.processed.append(src)
+        logger.debug("Optimized %s", src)
+        return digest, result
+
+    def outputs(self, relative: str) -> list[str]:
+        info = self.images.get(relative.replace(os.sep, "/"))
+        if info == None:
+            return []
+        return [relative] + [variant_path(relative, width) for width, height in info["variants"]]
+
+    def is_unchanged(self, src: str, stat: os.stat_result, dst_dir: str, relative: str) -> bool:
+        # Synced images are stamped with the mtime of their source. The variants synced last
+        # time must also be the ones the configured widths ask for now
+        info = self.images.get(relative.replace(os.sep, "/"))
+        if info == None:
+            return False
+        if [width for width, height in info["variants"]] != [width for width in self.widths if width < info["width"]]:
+            return False
+        outputs = self.outputs(relative)
+        for output in outputs:
+            try:
+                if os.stat(os.path.join(dst_dir, output)).st_mtime_ns != stat.st_mtime_ns:
+                    return False
+            except FileNotFoundError:
+                return False
+        return True
+
+    def sync(self, src: str, stat: os.stat_result, dst_dir: str, relative: str, sync_file) -> list[str]:
+        digest, result = self.process(src, stat)
+        variants = []
+        for width in result["widths"]:
+            variants.append([width, max(1, round(result["height"] * width / result["width"]))])
+        # Variants of widths that are no longer configured
+        previous = self.images.get(relative.replace(os.sep, "/"))
+        if previous != None:
+            for width, height in previous["variants"]:
+                if width not in result["widths"]:
+                    remove_output(os.path.join(dst_dir, variant_path(relative, width)), dst_dir)
+        self.images[relative.replace(os.sep, "/")] = {"width": result["width"], "height": result["height"], "variants": variants}
+        targets = [(self._cache_file(digest), relative)]
+        targets += [(self._cache_file(digest, width), variant_path(relative, width)) for width, height in variants]
+        for cache_file, output in targets:
+            dst = os.path.join(dst_dir, output)
+            sync_file(cache_file, dst)
+            os.utime(dst, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        return [output for cache_file, output in targets]
+
+
+    def retain(self, present: set[str]):
+        # Forgets images that left the static tree and deletes cache files nothing refers to
+        present = {relative.replace(os.sep, "/") for relative in present}
+        self.images = {relative: info for relative, info in self.images.items() if relative in present}
+        self.sources = {src: signature for src, signature in self.sources.items() if os.path.exists(src)}
+        digests = {signature[2] for signature in self.sources.values()}
+        self.results = {key: result for key, result in self.results.items() if key.split(":")[0] in digests}
+        if os.path.isdir(self.cache_dir) == False:
+            return
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".png") and entry.name.split("-")[0].split(".")[0] not in digests:
+                os.remove(entry.path)
+
+
+class ImageIndex:
+    # Read side of the optimizer index: width, height and srcset for the images a page refers to.
+    # srcset URLs get the same basepath as the src of the image
+    def __init__(self, path: str):
+        self.path = path
+        self.images = {}
+        self.signature = None
+        try:
+            with open(path, "rb") as file:
+                raw = file.read()
+            self.images = json.loads(raw).get("images", {})
+            self.signature = file_hash(path)
+        except (OSError, ValueError):
+            pass
+
+    def config(self) -> tuple:
+        return (self.path, self.signature)
+
+    def signature_for(self, urls: list[str]) -> str:
+        # Hash of what the index says about these images, so a page only goes stale when the
+        # images it shows change; URLs the index does not know count too, they may appear later
+        if len(urls) == 0:
+            return None
+        used = [[url, self.images.get(url[1:]) if url.startswith("/") else None] for url in sorted(set(urls))]
+        return hashlib.sha256(json.dumps(used, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def attributes(self, url: str, basepath: str = "/") -> dict:
+        if url.startswith("/") == False:
+            return {}
+        info = self.images.get(url[1:])
+        if info == None:
+            return {}
+        props = {"width": str(info["width"]), "height": str(info["height"])}
+        if len(info["variants"]) != 0:
+            candidates = [f"{with_basepath(variant_path(url, width), basepath)} {width}w" for width, height in info["variants"]]
+            candidates.append(f"{with_basepath(url, basepath)} {info['width']}w")
+            props["srcset"] = ", ".join(candidates)
+            props["sizes"] = f"(max-width: {info['width']}px) 100vw, {info['width']}px"
+        return props
+
+
+def open_image_index(path: str, signature: str = None) -> ImageIndex:
+    # One index per process and configuration, reopened when the index file changes
+    config = (path, signature)
+    index = _open_indexes.get(config)
+    if index == None:
+        index = ImageIndex(path)
+        _open_indexes[config] = index
+    return index
@@ -1,7 +1,10 @@
 from htmlnode import HTMLNode
 from textnode import TextNode, TextType
+from template import with_basepath
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props = None):
         super().__init__(tag, value, None, props)
 
@@ -13,7 +16,7 @@ class LeafNode(HTMLNode):
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
     
 
-def text_node_to_html_node(text_node: TextNode)-> LeafNode:
+def text_node_to_html_node(text_node: TextNode, images = None, basepath: str = "/")-> LeafNode:
     match text_node.text_type:
         case TextType.NORMAL:
             return LeafNode(None, text_node.text,None)
@@ -24,6 +27,9 @@ def text_node_to_html_node(text_node: TextNode)-> LeafNode:
         case TextType.CODE:
             return LeafNode("code",text_node.text,None)
         case TextType.LINK:
-            return LeafNode("a",text_node.text,{"href":text_node.url})
+            return LeafNode("a",text_node.text,{"href":with_basepath(text_node.url, basepath)})
         case TextType.IMAGE:
-            return LeafNode("img","",{"src":text_node.url, "alt":text_node.text})
+            props = {"src":with_basepath(text_node.url, basepath), "alt":text_node.text}
+            if images != None:
+                props.update(images.attributes(text_node.url, basepath))
+            return LeafNode("img","",props)
@@ -1,5 +1,22 @@
 from textnode import TEXT_TYPE_STRING, TextType, TextNode
 from mdparser import *
+from manifest import BuildManifest, CACHE_DIR, MANIFEST_FILE
+from fragcache import FRAGMENT_CACHE_DIR, FragmentCache
+from discovery import ContentFilter
+from metadata import METADATA_FILE, MetadataIndex
+from assets import LINK_MODES, sync_tree
+from images import IMAGE_CACHE_DIR, ImageIndex, ImageOptimizer
+from feeds import DEFAULT_FEED_ENTRIES, DEFAULT_FEED_SECTION, write_site_feeds
+from search import SEARCH_CACHE_FILE, SearchTerms, write_search_index
+from compress import DEFAULT_MIN_SIZE, precompress_tree, remove_variants
+from buildlog import configure, logger, phase
+from profiling import BuildProfiler
+from devserver import DevSite
+from watch import PollingWatcher, SiteRebuilder, watch_loop
+from contextlib import nullcontext
+import argparse
+import devserver
+import hashlib
 import os
 import shutil
 import sys
@@ -7,31 +24,205 @@ import sys
 STATIC_DIR = "static"
 PUBLIC_DIR = "docs"
 CONTENT_DIR = "content"
+TEMPLATE_PATH = "template.html"
 
 
-def _logpath( path, names):
-    print(f"Folder being copying from {path}:")
-    for file in names:
-        print("\t" + os.path.join(path, file))
-    return []
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the static site from the content directory")
+    parser.add_argument("basepath", nargs="?", default="/", help="prefix for the root relative links (default: /)")
+    parser.add_argument("--target", action="append", default=[], metavar="BASEPATH=DIR", help="also build the site for this basepath into DIR, can be repeated; pages are rendered once for all targets")
+    parser.add_argument("--force", action="store_true", help="ignore the build manifest and rebuild every page")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of worker processes used to generate pages (default: number of cores)")
+    parser.add_argument("--drafts", action="store_true", help="also build pages marked draft: true in their front matter")
+    parser.add_argument("--include", action="append", metavar="GLOB", help="only build content files matching this glob, can be repeated (default: *.md)")
+    parser.add_argument("--exclude", action="append", metavar="GLOB", help="skip content files and directories matching this glob, can be repeated; content/.contentignore adds more")
+    parser.add_argument("--writers", type=int, default=4, help="threads writing finished pages to disk, 0 writes them inline (default: 4)")
+    parser.add_argument("--precompress", action="store_true", help="write .gz (and .br with the brotli module) variants of the compressible files in the output")
+    parser.add_argument("--precompress-min-size", type=int, default=DEFAULT_MIN_SIZE, metavar="BYTES", help=f"smallest file that gets compressed variants (default: {DEFAULT_MIN_SIZE})")
+    parser.add_argument("--site-url", metavar="URL", help="origin the site is served from, such as https://example.com; writes sitemap.xml and an Atom feed.xml")
+    parser.add_argument("--feed-section", default=DEFAULT_FEED_SECTION, metavar="DIR", help=f"content directory whose pages make up the feed (default: {DEFAULT_FEED_SECTION})")
+    parser.add_argument("--feed-entries", type=int, default=DEFAULT_FEED_ENTRIES, metavar="N", help=f"newest pages listed in the feed (default: {DEFAULT_FEED_ENTRIES})")
+    parser.add_argument("--search", action="store_true", help="write a full-text search index, sharded by term prefix, to search/ in the output")
+    parser.add_argument("--optimize-images", action="store_true", help="losslessly recompress PNG files from the static directory and add their width and height to img tags")
+    parser.add_argument("--image-widths", type=int, nargs="+", default=[], metavar="PX", help="with --optimize-images, also write resized variants this wide and list them in srcset (needs Pillow)")
+    parser.add_argument("--link", choices=LINK_MODES, default="auto", help="how static files are placed in the output: auto tries a reflink and falls back to a copy (default: auto)")
+    parser.add_argument("--fragment-cache", type=int, default=64, metavar="MIB", help="size cap in MiB of the rendered block cache kept in .cache, 0 disables it (default: 64)")
+    parser.add_argument("--watch", action="store_true", help="keep running and rebuild whatever changes in the content, static and template files")
+    parser.add_argument("--serve", action="store_true", help="run a development server that renders pages on request and reloads the browser on changes")
+    parser.add_argument("--port", type=int, default=8888, help="port of the development server (default: 8888)")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between two polls in watch mode (default: 0.5)")
+    parser.add_argument("--profile", action="store_true", help="measure time and memory per build phase and per page, and print a report (implies --jobs 1)")
+    parser.add_argument("--profile-top", type=int, default=10, help="number of slowest pages listed in the profile report (default: 10)")
+    parser.add_argument("--profile-out", help="also write the profile to this file: a Chrome trace for .json, a cProfile/pstats dump otherwise")
+    parser.add_argument("-q", "--quiet", dest="log_level", action="store_const", const="quiet", default="info", help="only report warnings and errors")
+    parser.add_argument("-v", "--verbose", dest="log_level", action="store_const", const="debug", help="report every file that is copied or generated")
+    parser.add_argument("--log-format", choices=["text", "json"], default="text", help="write the log as plain text or as JSON lines")
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.site_url != None and args.site_url.startswith(("http://", "https://")) == False:
+        parser.error("--site-url must start with http:// or https://")
+    # --force deletes every target directory, so none may be a source of the site or hold the project
+    reserved = {os.path.realpath(path) for path in (PUBLIC_DIR, CONTENT_DIR, STATIC_DIR, CACHE_DIR)}
+    working_dir = os.path.realpath(".")
+    seen = set()
+    for target in args.target:
+        basepath, separator, dest_dir = target.partition("=")
+        if separator == "" or basepath.startswith("/") == False or dest_dir == "":
+            parser.error(f"--target expects BASEPATH=DIR, got {target}")
+        path = os.path.realpath(dest_dir)
+        if path in reserved or path == working_dir or working_dir.startswith(path.rstrip(os.sep) + os.sep):
+            parser.error(f"--target cannot build into {dest_dir}")
+        if path in seen:
+            parser.error(f"--target {dest_dir} is given twice")
+        seen.add(path)
+    return args
 
 
+def build_targets(args: argparse.Namespace, manifest: BuildManifest) -> list[BuildTarget]:
+    # The positional basepath builds into docs with the main manifest; every --target
+    # gets its own directory and a manifest named after a hash of its absolute path, so
+    # two directories never share one
+    targets = [BuildTarget(args.basepath, PUBLIC_DIR, manifest)]
+    for target in args.target:
+        basepath, separator, dest_dir = target.partition("=")
+        digest = hashlib.sha256(os.path.abspath(dest_dir).encode("utf-8")).hexdigest()[:16]
+        targets.append(BuildTarget(basepath, dest_dir, BuildManifest(os.path.join(CACHE_DIR, f"manifest-{digest}.json"))))
+    return targets
 
-def main():
 
-    if len(sys.argv) == 2:
-        basepath = sys.argv[1]
+def content_filter(args: argparse.Namespace) -> ContentFilter:
+    return ContentFilter(CONTENT_DIR, args.include, args.exclude)
+
+
+def fragment_cache(args: argparse.Namespace) -> FragmentCache:
+    if args.fragment_cache <= 0:
+        return None
+    return FragmentCache(os.path.join(CACHE_DIR, FRAGMENT_CACHE_DIR), args.fragment_cache * 1024 * 1024)
+
+
+def build(args: argparse.Namespace, manifest: BuildManifest, profiler: BuildProfiler = None, cache: FragmentCache = None, changed: set[str] = None) -> list[BuildTarget]:
+    # changed is set by the watch mode to the paths that changed since the previous build
+    targets = build_targets(args, manifest)
+    if args.force == True:
+        for target in targets:
+            target.manifest.clear()
+            if os.path.exists(target.dest_dir) == True:
+                logger.info("Removing the folder %s", target.dest_dir)
+                shutil.rmtree(target.dest_dir)
+
+    optimizer = None
+    images = None
+    if args.optimize_images == True:
+        optimizer = ImageOptimizer(os.path.join(CACHE_DIR, IMAGE_CACHE_DIR), args.image_widths)
+    for target in targets:
+        with phase("static sync"), (profiler.phase("static copy") if profiler != None else nullcontext()):
+            sync_report = sync_tree(STATIC_DIR, target.dest_dir, target.manifest, args.link, optimizer=optimizer)
+        logger.info(sync_report.summary(), extra={"fields": sync_report.counts()})
+    if optimizer != None:
+        optimizer.save()
+        logger.info("Images: %d optimized, %d from cache", len(optimizer.processed), len(optimizer.images) - len(optimizer.processed))
+        images = ImageIndex(optimizer.index_path)
+        # Pages take the dimensions of the images they show, so any image may affect any page
+        if changed != None and any(optimizer.handles(path) for path in changed):
+            changed = None
+
+    metadata = MetadataIndex(os.path.join(CACHE_DIR, METADATA_FILE))
+    search = SearchTerms(os.path.join(CACHE_DIR, SEARCH_CACHE_FILE)) if args.search == True else None
+    with phase("pages"):
+        generate_site(CONTENT_DIR, TEMPLATE_PATH, targets, args.force, args.jobs, profiler, cache, args.writers, content_filter(args), images, metadata, args.drafts, search, changed)
+
+    for target in targets:
+        report = target.report
+        for source, error in report.errors:
+            logger.error("Failed to generate %s: %s", source, error, extra={"fields": {"source": source, "error": error}})
+        fields = dict(report.counts(), target=target.dest_dir) if len(targets) > 1 else report.counts()
+        logger.info(report.summary(), extra={"fields": fields})
+
+        if args.site_url != None:
+            with phase("feeds"), (profiler.phase("feeds") if profiler != None else nullcontext()):
+                feed_report = write_site_feeds(CONTENT_DIR, target.dest_dir, target.basepath, args.site_url, report.generated + report.skipped,
+                                               metadata, args.feed_section, args.feed_entries)
+            logger.info(feed_report.summary(), extra={"fields": feed_report.counts()})
+            target.manifest.record_outputs("feeds", target.dest_dir, feed_report.written + feed_report.unchanged)
+        elif "feeds" in target.manifest.outputs:
+            logger.info("Removed %d sitemap and feed files", len(target.manifest.remove_outputs("feeds", target.dest_dir)))
+
+        if search != None:
+            with phase("search"), (profiler.phase("search") if profiler != None else nullcontext()):
+                search_report = write_search_index(CONTENT_DIR, target.dest_dir, report.generated + report.skipped, search, metadata)
+            logger.info(search_report.summary(), extra={"fields": search_report.counts()})
+            target.manifest.record_outputs("search", target.dest_dir, search_report.files)
+        elif "search" in target.manifest.outputs:
+            logger.info("Removed %d search index files", len(target.manifest.remove_outputs("search", target.dest_dir)))
+
+        if args.precompress == True:
+            with phase("precompress"), (profiler.phase("compress") if profiler != None else nullcontext()):
+                compress_report = precompress_tree(target.dest_dir, target.manifest, args.precompress_min_size, args.jobs)
+            logger.info(compress_report.summary(), extra={"fields": compress_report.counts()})
+        elif len(target.manifest.variants) != 0 or len(target.manifest.incompressible) != 0:
+            logger.info("Removed %d precompressed variants", len(remove_variants(target.dest_dir, target.manifest)))
+            target.manifest.incompressible = {}
+        target.manifest.save()
+    return targets
+
+
+def main(argv: list[str] = None):
+
+    args = parse_args(sys.argv[1:] if argv == None else argv)
+    configure(args.log_level, args.log_format == "json")
+    if args.serve == True:
+        serve(args)
+        return
+    if args.watch == True:
+        watch(args)
+        return
+
+    manifest = BuildManifest(os.path.join(CACHE_DIR, MANIFEST_FILE))
+    if args.profile == True or args.profile_out != None:
+        profiler = BuildProfiler()
+        profiler.start(cprofile=args.profile_out != None and args.profile_out.endswith(".json") == False)
+        try:
+            targets = build(args, manifest, profiler, fragment_cache(args))
+        finally:
+            profiler.stop()
+        print(profiler.report(args.profile_top))
+        if args.profile_out != None:
+            profiler.write(args.profile_out)
+            logger.info("Profile written to %s", args.profile_out)
     else:
-        basepath = "/"
+        targets = build(args, manifest, cache=fragment_cache(args))
+    if any(len(target.report.errors) != 0 for target in targets):
+        sys.exit(1)
+
+
+def watch(args: argparse.Namespace = None):
+    if args == None:
+        args = parse_args(sys.argv[1:])
+        configure(args.log_level, args.log_format == "json")
+
+    manifest = BuildManifest(os.path.join(CACHE_DIR, MANIFEST_FILE))
+    cache = fragment_cache(args)
+    build(args, manifest, cache=cache)
+
+    # Rebuilds never start over, even when the first build was forced
+    rebuild_args = argparse.Namespace(**dict(vars(args), force=False))
+    rebuilder = SiteRebuilder(CONTENT_DIR, STATIC_DIR, TEMPLATE_PATH, lambda changed: build(rebuild_args, manifest, cache=cache, changed=changed), content_filter(args))
+    watcher = PollingWatcher(rebuilder.watched_paths())
+    logger.info("Watching %s for changes, press Ctrl+C to stop", ", ".join(rebuilder.watched_paths()))
+    try:
+        watch_loop(watcher, rebuilder.rebuild, args.interval)
+    except KeyboardInterrupt:
+        pass
 
-    if os.path.exists(PUBLIC_DIR) == True:
-        print(f"Removing the folder {PUBLIC_DIR}:")
-        shutil.rmtree(PUBLIC_DIR)
-        
-    shutil.copytree(STATIC_DIR, PUBLIC_DIR, ignore=_logpath)
 
-    generate_pages_recursive(CONTENT_DIR, "template.html", PUBLIC_DIR, basepath)
+def serve(args: argparse.Namespace = None):
+    if args == None:
+        args = parse_args(sys.argv[1:])
+        configure(args.log_level, args.log_format == "json")
+    metadata = MetadataIndex(os.path.join(CACHE_DIR, METADATA_FILE))
+    devserver.serve(DevSite(CONTENT_DIR, STATIC_DIR, TEMPLATE_PATH, metadata, args.drafts, content_filter(args)), port=args.port, interval=args.interval)
 
-    print (sys.argv)
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
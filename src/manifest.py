@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+CACHE_DIR = ".cache"
+MANIFEST_FILE = "manifest.json"
+
+
+def source_version(directory: str) -> str:
+    # Hash of the generator's modules (tests left out): any change to the code that renders
+    # the site makes earlier outputs and caches stale, without a version to remember to bump
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py") and name.startswith("test_") == False:
+            digest.update(name.encode("utf-8") + b"\0")
+            with open(os.path.join(directory, name), "rb") as file:
+                digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+GENERATOR_VERSION = source_version(os.path.dirname(os.path.abspath(__file__)))
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    def __init__(self, path: str):
+        self.path = path
+        self.pages = {}
+        self.assets = []
+        self.variants = []
+        # Compressed variants not worth keeping, with the mtime of the source that showed it
+        self.incompressible = {}
+        # Files written by the optional build stages, such as search, by stage; relative to the output
+        self.outputs = {}
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.path) == False:
+            return
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("generator") != GENERATOR_VERSION:
+            return
+        self.pages = data.get("pages", {})
+        self.assets = data.get("assets", [])
+        self.variants = data.get("variants", [])
+        self.incompressible = data.get("incompressible", {})
+        self.outputs = data.get("outputs", {})
+
+    def save(self):
+        output_file = Path(self.path)
+        output_file.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"generator": GENERATOR_VERSION, "pages": self.pages, "assets": self.assets, "variants": self.variants,
+                       "incompressible": self.incompressible, "outputs": self.outputs}, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.pages = {}
+        self.assets = []
+        self.variants = []
+        self.incompressible = {}
+        self.outputs = {}
+
+    def record_outputs(self, stage: str, root: str, paths: list[str]):
+        self.outputs[stage] = sorted(os.path.relpath(path, root) for path in paths)
+
+    def remove_outputs(self, stage: str, root: str) -> list[str]:
+        # Removes the files of a stage that is no longer enabled
+        removed = []
+        for relative in self.outputs.pop(stage, []):
+            path = os.path.join(root, relative)
+            if remove_output(path, root):
+                removed.append(path)
+        return removed
+
+    def make_entry(self, source_hash: str, template_hash: str, basepath: str, output: str, images_signature: str = None, image_urls: list[str] = ()) -> dict:
+        entry = {
+            "source_hash": source_hash,
+            "template_hash": template_hash,
+            "basepath": basepath,
+            "generator": GENERATOR_VERSION,
+            "output": output,
+        }
+        if images_signature != None:
+            # Pages embed the sizes of the images they show, so they go stale when those change
+            entry["images"] = images_signature
+        if len(image_urls) != 0:
+            entry["image_urls"] = sorted(image_urls)
+        return entry
+
+    def is_up_to_date(self, source: str, entry: dict) -> bool:
+        previous = self.pages.get(source)
+        if previous != entry:
+            return False
+        return os.path.exists(entry["output"])
+
+    def record(self, source: str, entry: dict, root: str = None):
+        # root is the output directory; emptied directories are removed up to it
+        previous = self.pages.get(source)
+        if previous != None and previous["output"] != entry["output"]:
+            remove_output(previous["output"], root)
+        self.pages[source] = entry
+
+    def prune(self, sources, root: str = None) -> list[str]:
+        # Drops the entries (and their outputs) whose source is no longer present
+        sources = set(sources)
+        removed = []
+        for source in sorted(self.pages):
+            if source in sources:
+                continue
+            output = self.pages.pop(source)["output"]
+            if remove_output(output, root):
+                removed.append(output)
+        return removed
+
+
+def remove_output(path: str, root: str = None) -> bool:
+    # Also removes the directories left empty, up to (not including) root
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    root = os.path.normpath(root) if root != None else None
+    parent = os.path.dirname(path)
+    while parent != "" and os.path.normpath(parent) != root:
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+    return True
@@ -2,10 +2,23 @@ from textnode import TextNode, TextType, TEXT_TYPE_STRING
 from leafnode import LeafNode, text_node_to_html_node
 from parentnode import ParentNode
 from htmlnode import HTMLNode
+from manifest import BuildManifest, file_hash
+from buildlog import logger
+from template import BASEPATH_MARKER, compile_template
+from fragcache import FragmentCache, open_fragment_cache
+from writer import OutputWriter, write_output
+from discovery import ContentFilter
+from images import ImageIndex, open_image_index
+from metadata import MetadataIndex, split_front_matter
+from search import SearchTerms, page_terms
+import io
 import re
 from enum import Enum
 import os
 from pathlib import Path
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack, nullcontext
+from concurrent.futures import ProcessPoolExecutor
 
 
 class BlockType(Enum):
@@ -20,6 +33,8 @@ class BlockType(Enum):
     QUOTE = 8
     UNORDERED_LIST = 9
     ORDERED_LIST = 10
+    HORIZONTAL_RULE = 11
+    TABLE = 12
 
 def split_nodes(old_nodes: list[TextNode], delim: str, text_type: TextType)-> list[TextNode]:
     delta = len(delim)
@@ -51,248 +66,697 @@ def split_nodes(old_nodes: list[TextNode], delim: str, text_type: TextType)-> li
     #print(new_nodes)
     return new_nodes
 
+INLINE_SPECIAL = re.compile(r"[\\*_`!\[]")
+INLINE_ESCAPE = re.compile(r"\\([\\`*_\[\]()!#])")
+IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_PATTERN = re.compile(r"\[([^\[\]]*)\]\(([^\(\)]*)\)")
+STANDALONE_LINK_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
 def extract_markdown_images(text: str):
-    ans = re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
-    return ans
+    return IMAGE_PATTERN.findall(text)
 
 def extract_markdown_links(text: str):
-    ans = re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
-    return ans
+    return STANDALONE_LINK_PATTERN.findall(text)
 
-def split_nodes_image(old_nodes: list[TextNode]) -> list[TextNode]:
+def _split_nodes_pattern(old_nodes: list[TextNode], pattern: re.Pattern, text_type: TextType) -> list[TextNode]:
+    # One pass over each text: the match spans give the text between matches directly
     new_nodes = []
-    if len(old_nodes) == 0:
-        return new_nodes
-    
     for node in old_nodes:
         if node.text_type != TextType.NORMAL:
             new_nodes.append(node)
             continue
-        images_list = extract_markdown_images(node.text)
-
-        if len(images_list) == 0:
-            new_nodes.append(node)
-            continue
-
         node_text = node.text
-        for text, url in images_list:
-            text_index = node_text.find("![" + text + "]")
-            if text_index != 0:
-                new_nodes.append(TextNode(node_text[0:text_index],TextType.NORMAL))
-            new_nodes.append(TextNode(text,TextType.IMAGE,url))
-            url_end_index = node_text.find("(" + url +")") + len(url) + 2
-            node_text = node_text[url_end_index:]
-        
-        if len(node_text)!=0:
-            new_nodes.append(TextNode(node_text,TextType.NORMAL))
+        position = 0
+        for match in pattern.finditer(node_text):
+            if match.start() != position:
+                new_nodes.append(TextNode(node_text[position:match.start()], TextType.NORMAL))
+            new_nodes.append(TextNode(match.group(1), text_type, match.group(2)))
+            position = match.end()
+        if position == 0:
+            new_nodes.append(node)
+        elif position != len(node_text):
+            new_nodes.append(TextNode(node_text[position:], TextType.NORMAL))
     return new_nodes
 
+def split_nodes_image(old_nodes: list[TextNode]) -> list[TextNode]:
+    return _split_nodes_pattern(old_nodes, IMAGE_PATTERN, TextType.IMAGE)
+
 def split_nodes_link(old_nodes: list[TextNode]) -> list[TextNode]:
-    new_nodes = []
-    if len(old_nodes) == 0:
-        return new_nodes
-    
-    for node in old_nodes:
-        if node.text_type != TextType.NORMAL:
-            new_nodes.append(node)
+    return _split_nodes_pattern(old_nodes, STANDALONE_LINK_PATTERN, TextType.LINK)
+
+INLINE_DELIMITERS = {
+    "`": TextType.CODE,
+    "**": TextType.BOLD,
+    "_": TextType.ITALIC,
+}
+
+def _find_closing(text: str, delim: str, start: int) -> int:
+    index = text.find(delim, start)
+    while index > 0 and delim != "`":
+        backslashes = 0
+        while index - backslashes > 0 and text[index - backslashes - 1] == "\\":
+            backslashes += 1
+        if backslashes % 2 == 0:
+            break
+        index = text.find(delim, index + 1)
+    return index
+
+def text_to_textnodes(MDtext: str) -> list[TextNode]:
+    # Single left to right scan: code spans are literal, emphasis content is not
+    # parsed further, and unmatched or empty delimiters are kept as plain text.
+    # Nesting is not supported, since a TextNode has one type: "**bold _it_**" is bold text
+    # with literal underscores. The scan stays linear: a failed link or image match stops
+    # at the next bracket or parenthesis, and a delimiter without a closing one is not
+    # searched for again
+    nodes = []
+    pending = []
+    exhausted = set()
+    length = len(MDtext)
+    pos = 0
+    while pos < length:
+        match = INLINE_SPECIAL.search(MDtext, pos)
+        if match == None:
+            pending.append(MDtext[pos:])
+            break
+        index = match.start()
+        if index != pos:
+            pending.append(MDtext[pos:index])
+        char = MDtext[index]
+
+        if char == "\\":
+            if index + 1 < length and MDtext[index + 1] in "\\`*_[]()!#":
+                pending.append(MDtext[index + 1])
+                pos = index + 2
+            else:
+                pending.append(char)
+                pos = index + 1
             continue
-        links_list = extract_markdown_links(node.text)
 
-        if len(links_list) == 0:
-            new_nodes.append(node)
+        if char == "!" or char == "[":
+            pattern = IMAGE_PATTERN if char == "!" else LINK_PATTERN
+            found = pattern.match(MDtext, index)
+            if found == None:
+                # "![" that is not an image must not turn into a link either
+                skip = 2 if MDtext.startswith("![", index) else 1
+                pending.append(MDtext[index:index + skip])
+                pos = index + skip
+                continue
+            if len(pending) != 0:
+                nodes.append(TextNode("".join(pending), TextType.NORMAL))
+                pending = []
+            text_type = TextType.IMAGE if char == "!" else TextType.LINK
+            nodes.append(TextNode(found.group(1), text_type, found.group(2)))
+            pos = found.end()
             continue
 
-        node_text = node.text
-        for text, url in links_list:
-            text_index = node_text.find("[" + text + "]")
-            if text_index != 0:
-                new_nodes.append(TextNode(node_text[0:text_index],TextType.NORMAL))
-            new_nodes.append(TextNode(text,TextType.LINK,url))
-            url_end_index = node_text.find("(" + url +")") + len(url) + 2
-            node_text = node_text[url_end_index:]
-        
-        if len(node_text)!=0:
-            new_nodes.append(TextNode(node_text,TextType.NORMAL))
-    return new_nodes
+        if char == "*" and MDtext.startswith("**", index) == False:
+            pending.append(char)
+            pos = index + 1
+            continue
+        delim = "**" if char == "*" else char
+        delta = len(delim)
+        if delim in exhausted:
+            pending.append(delim)
+            pos = index + delta
+            continue
+        close = _find_closing(MDtext, delim, index + delta)
+        if close == -1:
+            exhausted.add(delim)
+            pending.append(delim)
+            pos = index + delta
+            continue
+        if close == index + delta:
+            pending.append(MDtext[index:close + delta])
+            pos = close + delta
+            continue
+        if len(pending) != 0:
+            nodes.append(TextNode("".join(pending), TextType.NORMAL))
+            pending = []
+        text = MDtext[index + delta:close]
+        if delim != "`":
+            text = INLINE_ESCAPE.sub(r"\1", text)
+        nodes.append(TextNode(text, INLINE_DELIMITERS[delim]))
+        pos = close + delta
 
-def text_to_textnodes(MDtext: str) -> list[TextNode]:
-    if len(MDtext) == 0:
-        return []
-    nodes_list = [TextNode(MDtext, TextType.NORMAL)]
-    nodes_list = split_nodes(nodes_list, "**", TextType.BOLD)
-    nodes_list = split_nodes(nodes_list, "_", TextType.ITALIC)
-    nodes_list = split_nodes(nodes_list, "`", TextType.CODE)
-    nodes_list = split_nodes_image(nodes_list)
-    nodes_list = split_nodes_link(nodes_list)
-    return nodes_list
+    if len(pending) != 0:
+        nodes.append(TextNode("".join(pending), TextType.NORMAL))
+    return nodes
+
+
+def _is_fence(line: str) -> bool:
+    return line.lstrip().startswith("```")
+
+def _closes_fence(line: str) -> bool:
+    stripped = line.strip()
+    return stripped.startswith("```") and stripped.strip("`") == ""
+
+def iter_block_lines(lines: Iterable[str]) -> Iterator[list[str]]:
+    # Blocks are separated by blank lines, except inside a fenced code block
+    block = []
+    in_fence = False
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if in_fence == True:
+            block.append(line)
+            if _closes_fence(line):
+                in_fence = False
+            continue
+        if line.strip() == "":
+            if len(block) != 0:
+                yield _strip_block(block)
+                block = []
+            continue
+        if len(block) == 0 and _is_fence(line):
+            stripped = line.strip()
+            in_fence = len(stripped) < 6 or stripped.endswith("```") == False
+        block.append(line)
+    if len(block) != 0:
+        yield _strip_block(block)
+
+def _strip_block(block: list[str]) -> list[str]:
+    while block[-1].strip() == "":
+        block.pop()
+    block[0] = block[0].lstrip()
+    block[-1] = block[-1].rstrip()
+    return block
 
+def iter_blocks(source) -> Iterator[tuple[BlockType, list[str]]]:
+    # source is a markdown string or any iterable of lines, such as an open file
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    for lines in iter_block_lines(source):
+        yield classify_block(lines), lines
 
 def markdown_to_blocks(markdown: str) -> list[str]:
-    print(f"MDText:\n\n{markdown}")
-    blocks_list = markdown.split("\n\n")
-    clean_block_list = []
-    for block in blocks_list:
-        x = block.strip()
-        if len(x) !=0:
-            clean_block_list.append(x)
-    
-    print("Bloques:\n")
-    print(clean_block_list)
-    return clean_block_list
+    return ["\n".join(lines) for lines in iter_block_lines(io.StringIO(markdown))]
+
+HEADING_TYPES = (BlockType.HEADING_1, BlockType.HEADING_2, BlockType.HEADING_3,
+                 BlockType.HEADING_4, BlockType.HEADING_5, BlockType.HEADING_6)
+TABLE_DELIMITER_CELL = re.compile(r"\s*:?-+:?\s*")
+CODE_INFO = re.compile(r"[\w+#.-]+")
+# Fragment cache salt of the plain text kept next to the HTML of a block
+TEXT_SALT = "text"
+
+def _classify_heading(lines: list[str]) -> BlockType:
+    first = lines[0]
+    level = 0
+    while level < 7 and level < len(first) and first[level] == "#":
+        level += 1
+    if level <= 6 and first[level:level + 1] == " ":
+        return HEADING_TYPES[level - 1]
+    return None
+
+def _classify_code(lines: list[str]) -> BlockType:
+    if lines[0].startswith("```") and lines[-1].endswith("```") and (len(lines) > 1 or len(lines[0]) > 6):
+        return BlockType.CODE
+    return None
+
+def _classify_quote(lines: list[str]) -> BlockType:
+    for line in lines:
+        if line[0:2] != "> " and line != ">":
+            return None
+    return BlockType.QUOTE
+
+def _classify_unordered_list(lines: list[str]) -> BlockType:
+    marker = lines[0][0] + " "
+    for line in lines:
+        if line[0:2] != marker:
+            return None
+    return BlockType.UNORDERED_LIST
+
+def _classify_ordered_list(lines: list[str]) -> BlockType:
+    counter = 1
+    for line in lines:
+        if line.startswith(f"{counter}. ") == False:
+            return None
+        counter += 1
+    return BlockType.ORDERED_LIST
+
+def _classify_rule(lines: list[str]) -> BlockType:
+    # Three or more of the same marker, optionally separated by spaces: ---, ***, _ _ _
+    if len(lines) != 1:
+        return None
+    marks = lines[0].replace(" ", "")
+    if len(marks) >= 3 and marks.strip(marks[0]) == "":
+        return BlockType.HORIZONTAL_RULE
+    return None
+
+def _table_cells(line: str) -> list[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|"):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split("|")]
+
+def _classify_table(lines: list[str]) -> BlockType:
+    # A header row, a delimiter row such as |---|:--:| and any number of body rows
+    if len(lines) < 2:
+        return None
+    for line in lines:
+        if line.startswith("|") == False:
+            return None
+    for cell in _table_cells(lines[1]):
+        if TABLE_DELIMITER_CELL.fullmatch(cell) == None:
+            return None
+    return BlockType.TABLE
+
+# First character of a block -> classifiers tried in order; a block whose first
+# character has no entry, like most paragraphs, costs a single dict lookup
+BLOCK_CLASSIFIERS = {
+    "#": [_classify_heading],
+    "`": [_classify_code],
+    ">": [_classify_quote],
+    "-": [_classify_rule, _classify_unordered_list],
+    "*": [_classify_rule, _classify_unordered_list],
+    "_": [_classify_rule],
+    "1": [_classify_ordered_list],
+    "|": [_classify_table],
+}
+
+def register_block_classifier(first_chars: str, classifier):
+    for char in first_chars:
+        BLOCK_CLASSIFIERS.setdefault(char, []).append(classifier)
+
+def classify_block(lines: list[str]) -> BlockType:
+    if len(lines[0]) == 0:
+        return BlockType.PARAGRAPH
+    for classifier in BLOCK_CLASSIFIERS.get(lines[0][0], ()):
+        block_type = classifier(lines)
+        if block_type != None:
+            return block_type
+    return BlockType.PARAGRAPH
 
 def block_to_block_type(MDBlock: str) -> BlockType:
-    match MDBlock[0]:
-        case "#":
-            if MDBlock.find("###### ") == 0:
-                return BlockType.HEADING_6
-            elif MDBlock.find("##### ") == 0:
-                return BlockType.HEADING_5
-            elif MDBlock.find("#### ") == 0:
-                return BlockType.HEADING_4
-            elif MDBlock.find("### ") == 0:
-                return BlockType.HEADING_3
-            elif MDBlock.find("## ") == 0:
-                return BlockType.HEADING_2
-            elif MDBlock.find("# ") == 0:
-                return BlockType.HEADING_1
-            else:
-                return BlockType.PARAGRAPH
-        case "`":
-            n = len(MDBlock)
-            if MDBlock[0:3]=="```" and MDBlock[n-3:n]=="```" and len(MDBlock)>6:
-                return BlockType.CODE
-            return BlockType.PARAGRAPH
-        case ">":
-            lines = MDBlock.split("\n")
-            for line in lines:
-                if line[0:2] != "> ":
-                    if line[0] == ">" and len(line) == 1:
-                        continue
-                    return BlockType.PARAGRAPH
-            return BlockType.QUOTE
-        case "-":
-            lines = MDBlock.split("\n")
-            for line in lines:
-                if line[0:2] != "- ":
-                    return BlockType.PARAGRAPH
-            return BlockType.UNORDERED_LIST
-        case "*":
-            lines = MDBlock.split("\n")
-            for line in lines:
-                if line[0:2] != "* ":
-                    return BlockType.PARAGRAPH
-            return BlockType.UNORDERED_LIST
-        case "1":
-            lines = MDBlock.split("\n")
-            counter = 1
-            for line in lines:
-                if line[0:3] != f"{counter}. ":
-                    return BlockType.PARAGRAPH
-                counter += 1
-            return BlockType.ORDERED_LIST
-        case _:
-            return BlockType.PARAGRAPH
-
-def make_parent_node(block: str, tag: str) -> ParentNode:
+    return classify_block(MDBlock.split("\n"))
+
+def make_parent_node(block: str, tag: str, images: ImageIndex = None, basepath: str = "/", text: list[str] = None) -> ParentNode:
     nodes_list = text_to_textnodes(block)
     children = []
     for node in nodes_list:
-        children.append(text_node_to_html_node(node))                
+        children.append(text_node_to_html_node(node, images, basepath))
+        if text != None:
+            text.append(node.text)
     return ParentNode(tag, children)
 
-def make_parent_node_block_list(block: str, tag:str)->ParentNode:
+def make_parent_node_block_list(block: str, tag:str, images: ImageIndex = None, basepath: str = "/", text: list[str] = None)->ParentNode:
     lines = block.split("\n")
     html_nodes_list = []
     for line in lines:
         space_index = line.find(" ")
-        html_nodes_list.append(make_parent_node(line[space_index:].strip(), "li"))
+        html_nodes_list.append(make_parent_node(line[space_index:].strip(), "li", images, basepath, text))
     return ParentNode(tag, html_nodes_list)
 
-def markdown_to_html_node(md_doc: str) -> HTMLNode:
-    md_blocks = markdown_to_blocks(md_doc)
+def _table_cell_node(cell: str, tag: str, align: str, images: ImageIndex = None, basepath: str = "/", text: list[str] = None) -> HTMLNode:
+    props = {"style": f"text-align: {align}"} if align != None else None
+    nodes = text_to_textnodes(cell)
+    children = [text_node_to_html_node(node, images, basepath) for node in nodes]
+    if text != None:
+        text.extend(node.text for node in nodes)
+    if len(children) == 0:
+        children = [LeafNode(None, "")]
+    return ParentNode(tag, children, props)
+
+def make_table_node(lines: list[str], images: ImageIndex = None, basepath: str = "/", text: list[str] = None) -> ParentNode:
+    aligns = []
+    for cell in _table_cells(lines[1]):
+        if cell.startswith(":") and cell.endswith(":"):
+            aligns.append("center")
+        elif cell.endswith(":"):
+            aligns.append("right")
+        elif cell.startswith(":"):
+            aligns.append("left")
+        else:
+            aligns.append(None)
+    header = _table_cells(lines[0])
+    columns = len(header)
+    aligns = (aligns + [None] * columns)[:columns]
+    rows = [ParentNode("tr", [_table_cell_node(cell, "th", align, images, basepath, text) for cell, align in zip(header, aligns)])]
+    children = [ParentNode("thead", rows)]
+    body = []
+    for line in lines[2:]:
+        cells = (_table_cells(line) + [""] * columns)[:columns]
+        body.append(ParentNode("tr", [_table_cell_node(cell, "td", align, images, basepath, text) for cell, align in zip(cells, aligns)]))
+    if len(body) != 0:
+        children.append(ParentNode("tbody", body))
+    return ParentNode("table", children)
+
+def block_to_html_node(block_type: BlockType, lines: list[str], images: ImageIndex = None, basepath: str = "/", text: list[str] = None) -> HTMLNode:
+    block = "\n".join(lines)
+    match block_type:
+        case BlockType.PARAGRAPH:    
+            return make_parent_node(block, "p", images, basepath, text)
+        case BlockType.HEADING_1:                               
+            return make_parent_node(block[2:].strip(), "h1", images, basepath, text)
+        case BlockType.HEADING_2:
+            return make_parent_node(block[3:].strip(), "h2", images, basepath, text)
+        case BlockType.HEADING_3:
+            return make_parent_node(block[4:].strip(), "h3", images, basepath, text)
+        case BlockType.HEADING_4:
+            return make_parent_node(block[5:].strip(), "h4", images, basepath, text)
+        case BlockType.HEADING_5:
+            return make_parent_node(block[6:].strip(), "h5", images, basepath, text)
+        case BlockType.HEADING_6:
+            return make_parent_node(block[7:].strip(), "h6", images, basepath, text)
+        case BlockType.CODE:
+            info = lines[0][3:].strip()
+            if len(lines) > 1 and CODE_INFO.fullmatch(info) != None:
+                code = "\n".join(lines[1:])[:-3].strip() + "\n"
+                props = {"class": f"language-{info}"}
+            else:
+                code = block[3:-3].strip() + "\n"
+                props = None
+            if text != None:
+                text.append(code)
+            return ParentNode("pre",[LeafNode("code", code, props)])
+        case BlockType.QUOTE:
+            new_block = []
+            for line in lines:
+                new_block.append(line[2:])                
+            return make_parent_node("\n".join(new_block), "blockquote", images, basepath, text)
+        case BlockType.UNORDERED_LIST:
+            return make_parent_node_block_list(block, "ul", images, basepath, text)
+        case BlockType.ORDERED_LIST:
+            return make_parent_node_block_list(block, "ol", images, basepath, text)
+        case BlockType.HORIZONTAL_RULE:
+            return LeafNode("hr", "")
+        case BlockType.TABLE:
+            return make_table_node(lines, images, basepath, text)
+
+def markdown_to_html_node(md_doc, cache: FragmentCache = None, images: ImageIndex = None, basepath: str = "/", text: list[str] = None, image_urls: list[str] = None) -> HTMLNode:
+    # md_doc is a markdown string or an iterable of lines; blocks are parsed lazily.
+    # With a cache, each block becomes a raw HTML leaf holding its rendered fragment.
+    # With a text list, the text of every TextNode is appended to it, for the search index.
+    # With an image_urls list, the URLs of the images are appended to it, with or without an
+    # image index, so a page built without one is known to need it once images are optimized
     html_node_list = []
-    for block in md_blocks:
-        match block_to_block_type(block):
-            case BlockType.PARAGRAPH:    
-                html_node_list.append(make_parent_node(block, "p"))
-            case BlockType.HEADING_1:                               
-                html_node_list.append(make_parent_node(block[2:].strip(), "h1"))
-            case BlockType.HEADING_2:
-                html_node_list.append(make_parent_node(block[3:].strip(), "h2"))
-            case BlockType.HEADING_3:
-                html_node_list.append(make_parent_node(block[4:].strip(), "h3"))
-            case BlockType.HEADING_4:
-                html_node_list.append(make_parent_node(block[5:].strip(), "h4"))
-            case BlockType.HEADING_5:
-                html_node_list.append(make_parent_node(block[6:].strip(), "h5"))
-            case BlockType.HEADING_6:
-                html_node_list.append(make_parent_node(block[7:].strip(), "h6"))
-            case BlockType.CODE:
-                html_node_list.append(ParentNode("pre",[LeafNode("code", block[3:-3].strip() + "\n")]))
-            case BlockType.QUOTE:
-                lines = block.split("\n")
-                new_block = []
-                for line in lines:
-                    new_block.append(line[2:])                
-                html_node_list.append(make_parent_node("\n".join(new_block), "blockquote"))
-            case BlockType.UNORDERED_LIST:
-                html_node_list.append(make_parent_node_block_list(block, "ul"))
-            case BlockType.ORDERED_LIST:
-                html_node_list.append(make_parent_node_block_list(block, "ol"))
+    basepath_salt = f"basepath:{basepath}" if basepath != "/" else ""
+    for block_type, lines in iter_blocks(md_doc):
+        block_images = []
+        if (images != None or image_urls != None) and any("![" in line for line in lines):
+            block_images = [url for alt, url in extract_markdown_images("\n".join(lines))]
+            if image_urls != None:
+                image_urls.extend(block_images)
+        if cache == None:
+            html_node_list.append(block_to_html_node(block_type, lines, images, basepath, text))
+            continue
+        # Blocks with images also depend on what the index says about them, and blocks with
+        # links or images on the basepath
+        salt = f"images:{images.signature_for(block_images)}" if images != None and len(block_images) != 0 else ""
+        if basepath_salt != "" and any("](" in line for line in lines):
+            salt += basepath_salt
+        key = cache.key(block_type, lines, salt)
+        html = cache.get(key)
+        # The text of a block is cached next to its HTML, so cached blocks need no parsing either
+        text_key = cache.key(block_type, lines, TEXT_SALT) if text != None else None
+        block_text = cache.get(text_key) if text_key != None else None
+        if html == None or (text_key != None and block_text == None):
+            block_texts = [] if text_key != None else None
+            html = block_to_html_node(block_type, lines, images, basepath, block_texts).to_html()
+            cache.put(key, html)
+            if text_key != None:
+                block_text = "\n".join(block_texts)
+                cache.put(text_key, block_text)
+        if text_key != None:
+            text.append(block_text)
+        html_node_list.append(LeafNode(None, html))
     node = ParentNode("div", html_node_list)
-    #print(f"HTML Text: {node.to_html()}")
     return node 
 
 def extract_title(md_doc: str) -> str:
-    lines = md_doc.split("\n")
+    # The title from the front matter, or else the first "# " heading; lines are read
+    # lazily, so the search stops there instead of splitting the whole document
+    meta, lines = split_front_matter(io.StringIO(md_doc))
+    if meta["title"] != None:
+        return meta["title"]
     for line in lines:
         striped_line = line.strip()
         if striped_line[0:2] == "# ":
             return striped_line[2:].strip()    
     raise ValueError("No level 1 heading found")
 
-def generate_page(from_path: str, template_path: str, dest_path: str, basepath: str):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+def _lines_with_title(lines: Iterable[str], title: list[str]) -> Iterator[str]:
+    # Same rule as extract_title, applied while the lines stream through the parser
+    for line in lines:
+        if len(title) == 0:
+            striped_line = line.strip()
+            if striped_line[0:2] == "# ":
+                title.append(striped_line[2:].strip())
+        yield line
+
+def parse_page(from_path: str, cache: FragmentCache = None, images: ImageIndex = None, basepath: str = "/", text: list[str] = None, image_urls: list[str] = None) -> tuple[str, HTMLNode]:
     with open(from_path) as file:
-        md_doc = file.read()
-    
-    with open(template_path) as file:
-        template_doc = file.read()
+        meta, lines = split_front_matter(file)
+        title = [meta["title"]] if meta["title"] != None else []
+        content_node = markdown_to_html_node(_lines_with_title(lines, title), cache, images, basepath, text, image_urls)
+    if len(title) == 0:
+        raise ValueError("No level 1 heading found")
+    if text != None:
+        text.append(title[0])
+    return title[0], content_node
 
-    content = markdown_to_html_node(md_doc).to_html()
+def _targets_basepath(basepaths: list[str]) -> str:
+    # A single target is built with its own basepath; several share one build with the
+    # marker, which is swapped for each basepath at the end
+    return basepaths[0] if len(basepaths) == 1 else BASEPATH_MARKER
 
-    title = extract_title(md_doc)
+def _render_page_profiled(from_path: str, template_path: str, basepaths: list[str], profiler, cache: FragmentCache = None, images: ImageIndex = None, text: list[str] = None, image_urls: list[str] = None) -> list[bytes]:
+    # Same output as render_page_targets, but materialized step by step so each phase can be timed
+    basepath = _targets_basepath(basepaths)
+    with profiler.phase("parse", from_path):
+        title, content_node = parse_page(from_path, cache, images, basepath, text, image_urls)
+    with profiler.phase("serialize", from_path):
+        content = content_node.to_html()
+    with profiler.phase("template", from_path):
+        template = compile_template(template_path, basepath)
+        values = {"Title": title, "Content": LeafNode(None, content)}
+        html_docs = [template.render(values)] if len(basepaths) == 1 else template.render_targets(values, basepaths)
+    return [html_doc.encode("utf-8") for html_doc in html_docs]
 
-    html_doc = template_doc.replace("{{ Title }}", title)
-    html_doc = html_doc.replace("{{ Content }}", content)
-    html_doc = html_doc.replace("href=\"/", f"href=\"{basepath}")
-    html_doc = html_doc.replace("src=\"/", f"src=\"{basepath}")
+def render_page_targets(from_path: str, template_path: str, basepaths: list[str], profiler = None, cache: FragmentCache = None, images: ImageIndex = None, text: list[str] = None, image_urls: list[str] = None) -> list[bytes]:
+    # The page is parsed and rendered once; further basepaths only cost a split and join of the result
+    if profiler != None:
+        return _render_page_profiled(from_path, template_path, basepaths, profiler, cache, images, text, image_urls)
+    basepath = _targets_basepath(basepaths)
+    template = compile_template(template_path, basepath)
+    title, content_node = parse_page(from_path, cache, images, basepath, text, image_urls)
+    if len(basepaths) > 1:
+        html_docs = template.render_targets({"Title": title, "Content": content_node}, basepaths)
+        return [html_doc.encode("utf-8") for html_doc in html_docs]
+    # The page is joined here on purpose: it leaves the worker process as bytes, and the writer
+    # needs the whole page to skip files that already hold it. render_to still saves building
+    # the intermediate strings of the content tree; write_stream is kept for feeds and sitemaps,
+    # which can be too large to hold in memory
+    fragments = []
+    template.render_to(fragments.append, {"Title": title, "Content": content_node})
+    return ["".join(fragments).encode("utf-8")]
 
-    output_file = Path(dest_path)
-    output_file.parent.mkdir(exist_ok=True, parents=True)
+def render_page(from_path: str, template_path: str, basepath: str, profiler = None, cache: FragmentCache = None, images: ImageIndex = None) -> bytes:
+    return render_page_targets(from_path, template_path, [basepath], profiler, cache, images)[0]
 
-    with open(output_file, "w") as file:
-        file.write(html_doc)
+def generate_page(from_path: str, template_path: str, dest_path: str, basepath: str, profiler = None, cache: FragmentCache = None, writer: OutputWriter = None, images: ImageIndex = None):
+    # Without a writer the page is written before returning; with one, the write is
+    # queued and its Future returned
+    logger.debug("Generating page from %s to %s using %s", from_path, dest_path, template_path)
+    data = render_page(from_path, template_path, basepath, profiler, cache, images)
+    if writer != None:
+        return writer.submit(dest_path, data)
+    with _profile_phase(profiler, "write", from_path):
+        Path(dest_path).parent.mkdir(exist_ok=True, parents=True)
+        write_output(dest_path, data)
 
 def get_all_files_path(dir_path)-> list[str]:
     files_list = []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                files_list += get_all_files_path(entry.path)
+            else:
+                files_list.append(entry.path)
+    return files_list
+
+
+def content_dest_path(content_file: str, dir_path_content: str, dest_dir_path: str) -> str:
+    return dest_dir_path + os.path.splitext(content_file[len(dir_path_content):])[0] + ".html"
+
+
+def _profile_phase(profiler, name: str, page: str = None):
+    return profiler.phase(name, page) if profiler != None else nullcontext()
+
+
+class BuildReport:
+    def __init__(self):
+        self.generated = []
+        self.skipped = []
+        self.removed = []
+        self.errors = []
+
+    def counts(self) -> dict:
+        return {
+            "generated": len(self.generated),
+            "skipped": len(self.skipped),
+            "removed": len(self.removed),
+            "failed": len(self.errors),
+        }
+
+    def summary(self) -> str:
+        return "Pages: {generated} generated, {skipped} up to date, {removed} removed, {failed} failed".format(**self.counts())
+
 
-    files_current_dir = os.listdir(dir_path)
-    for file_name in files_current_dir:
-        if os.path.isdir(dir_path + "/" + file_name) == True:
-            files_list += get_all_files_path(dir_path + "/" + file_name)
+def _render_page_task(task: tuple[str, str, list[str], tuple, tuple, bool], profiler = None) -> tuple[list[bytes], list[str], list[str], str]:
+    # Runs in a worker process, so errors are returned as text instead of raised.
+    # The fragment cache and image index travel as their configuration and are opened once per process.
+    # The URLs of the images the page shows come back with the pages, for its manifest entry.
+    # With collect_text the search terms of the page come back too; without basepaths the
+    # page is only parsed for them
+    from_path, template_path, basepaths, cache_config, images_config, collect_text = task
+    cache = open_fragment_cache(*cache_config) if cache_config != None else None
+    images = open_image_index(*images_config) if images_config != None else None
+    text = [] if collect_text == True else None
+    image_urls = []
+    try:
+        if len(basepaths) == 0:
+            parse_page(from_path, cache, images, text=text)
+            pages = []
         else:
-            files_list.append(dir_path + "/" + file_name)
+            pages = render_page_targets(from_path, template_path, basepaths, profiler, cache, images, text, image_urls)
+        return pages, page_terms(text) if text != None else None, sorted(set(image_urls)), None
+    except Exception as error:
+        return None, None, None, f"{type(error).__name__}: {error}"
+
+
+class BuildTarget:
+    # One output of a build: where the pages go, the basepath their links get, and the
+    # manifest that tracks them
+    def __init__(self, basepath: str, dest_dir: str, manifest: BuildManifest = None):
+        self.basepath = basepath
+        self.dest_dir = dest_dir
+        self.manifest = manifest
+        self.report = BuildReport()
 
-    return files_list
-    
 
-def generate_pages_recursive(dir_path_content: str, template_path: str, dest_dir_path: str, basepath: str):
+def generate_site(dir_path_content: str, template_path: str, targets: list[BuildTarget], force: bool = False, jobs: int = 1, profiler = None, cache: FragmentCache = None, writers: int = 4, content_filter: ContentFilter = None, images: ImageIndex = None, metadata: MetadataIndex = None, drafts: bool = False, search: SearchTerms = None, changed: set[str] = None):
+    # Builds every target in one pass: a page that is stale in any target is rendered once
+    # and written to each target that needs it. Results end up in each target's report.
+    # With a metadata index, draft pages are left out of the site unless drafts is set.
+    # With search terms, every page whose terms are not cached has them extracted while it
+    # is rendered, or parsed for them alone when all its outputs are up to date.
+    # changed is the set of paths known to have changed since the last build, as the watch
+    # mode sees them: other pages already in a manifest are kept without being hashed
     if os.path.isdir(dir_path_content) == False:
         raise Exception("The path to the contect directory is not a directory")
-    content_files_list = get_all_files_path(dir_path_content)
-    content_dir_length = len(dir_path_content)
-    for content_file  in content_files_list:
-        tot_length = len(content_file)
-        dest_file = dest_dir_path + content_file[content_dir_length:tot_length-2] + "html"
-        generate_page(content_file, template_path, dest_file, basepath)
+    if content_filter == None:
+        content_filter = ContentFilter(dir_path_content)
+    with _profile_phase(profiler, "discovery"):
+        entries = sorted(content_filter.walk(), key=lambda entry: entry.path)
+    content_files_list = [entry.path for entry in entries]
+    stats = {entry.path: entry.stat() for entry in entries}
+    # Pages whose metadata cannot be read fail like pages that cannot be rendered: they are
+    # reported and not built, but their previous outputs are kept
+    failed = []
+    if metadata != None:
+        with _profile_phase(profiler, "metadata"):
+            content_files_list = []
+            for entry in entries:
+                try:
+                    meta = metadata.get(entry.path, stats[entry.path])
+                except ValueError as error:
+                    failed.append(entry.path)
+                    for target in targets:
+                        target.report.errors.append((entry.path, f"{type(error).__name__}: {error}"))
+                    continue
+                if drafts == True or meta["draft"] == False:
+                    content_files_list.append(entry.path)
+            metadata.prune(entry.path for entry in entries)
+            metadata.save()
+    uses_manifest = any(target.manifest != None for target in targets)
+    template_hash = file_hash(template_path) if uses_manifest else None
+    cache_config = cache.config() if cache != None else None
+    images_config = images.config() if images != None else None
+    if changed != None:
+        changed = {os.path.normpath(path) for path in changed}
+        if os.path.normpath(template_path) in changed:
+            changed = None
+    tasks = []
+    task_outputs = []
+    for content_file in content_files_list:
+        source_hash = None
+        outputs = []
+        for target in targets:
+            dest_file = content_dest_path(content_file, dir_path_content, target.dest_dir)
+            entry = None
+            if target.manifest != None:
+                if force == False and changed != None and os.path.normpath(content_file) not in changed and content_file in target.manifest.pages:
+                    target.report.skipped.append(content_file)
+                    continue
+                with _profile_phase(profiler, "manifest"):
+                    if source_hash == None:
+                        source_hash = file_hash(content_file)
+                    # An unchanged page shows the images it showed when it was last built
+                    previous = target.manifest.pages.get(content_file)
+                    image_urls = previous.get("image_urls", []) if previous != None else []
+                    images_signature = images.signature_for(image_urls) if images != None else None
+                    entry = target.manifest.make_entry(source_hash, template_hash, target.basepath, dest_file, images_signature, image_urls)
+                if force == False and target.manifest.is_up_to_date(content_file, entry):
+                    target.report.skipped.append(content_file)
+                    continue
+            outputs.append((target, dest_file, entry))
+        collect_text = search != None and search.get(content_file, stats[content_file]) == None
+        if len(outputs) != 0 or collect_text == True:
+            tasks.append((content_file, template_path, [target.basepath for target, dest_file, entry in outputs], cache_config, images_config, collect_text))
+            task_outputs.append(outputs)
+
+    # Rendered pages are handed to the writer as they arrive, so writes overlap with rendering.
+    # Profiled builds render serially and write inline, to time each phase in this process
+    pending = []
+    with OutputWriter(0 if profiler != None else writers) as writer, ExitStack() as stack:
+        writer.make_dirs(dest_file for outputs in task_outputs for target, dest_file, entry in outputs)
+        if profiler != None:
+            results = (_render_page_task(task, profiler) for task in tasks)
+        elif jobs > 1 and len(tasks) > 1:
+            workers = min(jobs, len(tasks))
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            results = executor.map(_render_page_task, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+        else:
+            results = map(_render_page_task, tasks)
+        for task, outputs, (pages, terms, image_urls, error) in zip(tasks, task_outputs, results):
+            content_file = task[0]
+            if terms != None:
+                search.put(content_file, stats[content_file], terms)
+            if error != None:
+                for target, dest_file, entry in outputs:
+                    target.report.errors.append((content_file, error))
+                continue
+            for (target, dest_file, entry), data in zip(outputs, pages):
+                if entry != None:
+                    images_signature = images.signature_for(image_urls) if images != None else None
+                    entry = target.manifest.make_entry(entry["source_hash"], entry["template_hash"], entry["basepath"], entry["output"],
+                                                       images_signature, image_urls)
+                with _profile_phase(profiler, "write", content_file):
+                    pending.append((target, content_file, dest_file, entry, writer.submit(dest_file, data)))
+
+    for target, content_file, dest_file, entry, future in pending:
+        error = future.exception()
+        if error != None:
+            target.report.errors.append((content_file, f"{type(error).__name__}: {error}"))
+            continue
+        logger.debug("Generated %s from %s (%s)", dest_file, content_file, "written" if future.result() == True else "unchanged")
+        target.report.generated.append(content_file)
+        if target.manifest != None:
+            target.manifest.record(content_file, entry, target.dest_dir)
+
+    for target in targets:
+        if target.manifest != None:
+            target.report.removed = target.manifest.prune(content_files_list + failed, target.dest_dir)
+            target.manifest.save()
+    if search != None:
+        search.prune(content_files_list + failed)
+        search.save()
+    if cache != None:
+        cache.trim()
+
+
+def generate_pages_recursive(dir_path_content: str, template_path: str, dest_dir_path: str, basepath: str, manifest: BuildManifest = None, force: bool = False, jobs: int = 1, profiler = None, cache: FragmentCache = None, writers: int = 4, content_filter: ContentFilter = None, images: ImageIndex = None, metadata: MetadataIndex = None, drafts: bool = False, search: SearchTerms = None, changed: set[str] = None) -> BuildReport:
+    target = BuildTarget(basepath, dest_dir_path, manifest)
+    generate_site(dir_path_content, template_path, [target], force, jobs, profiler, cache, writers, content_filter, images, metadata, drafts, search, changed)
+    return target.report
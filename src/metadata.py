@@ -0,0 +1,166 @@
+from buildlog import logger
+from manifest import GENERATOR_VERSION
+from writer import write_output
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+import itertools
+import json
+import os
+
+FRONT_MATTER_DELIMITER = "---"
+# A file whose opening delimiter is not closed within this many lines has no front matter
+MAX_FRONT_MATTER_LINES = 100
+METADATA_FILE = "metadata.json"
+TRUE_VALUES = ("true", "yes", "on")
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def parse_front_matter_value(value: str):
+    # The small subset of YAML front matter needs: quoted or bare strings and [inline, lists]
+    value = value.strip()
+    if value.startswith("[") and value.endswith("]"):
+        return [_unquote(item.strip()) for item in value[1:-1].split(",") if item.strip() != ""]
+    return _unquote(value)
+
+
+def parse_front_matter(lines: list[str]) -> dict:
+    values = {}
+    key = None
+    for line in lines:
+        stripped = line.strip()
+        if stripped == "" or stripped.startswith("#"):
+            continue
+        # "- item" lines continue the list of the key above them
+        if stripped.startswith("- ") and key != None and (values[key] == "" or isinstance(values[key], list)):
+            values[key] = (values[key] or []) + [_unquote(stripped[2:].strip())]
+            continue
+        name, separator, value = stripped.partition(":")
+        if separator == "":
+            raise ValueError(f"Invalid front matter line: {stripped}")
+        key = name.strip().lower()
+        values[key] = parse_front_matter_value(value)
+    return values
+
+
+def parse_date(date: str) -> datetime:
+    # Front matter dates are YYYY-MM-DD or a full ISO 8601 timestamp; dates without a
+    # time zone are UTC
+    parsed = datetime.fromisoformat(date.replace("Z", "+00:00"))
+    if parsed.tzinfo == None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def normalize_metadata(values: dict) -> dict:
+    meta = dict(values)
+    tags = meta.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip() != ""]
+    meta["tags"] = tags
+    draft = meta.get("draft", False)
+    meta["draft"] = draft.lower() in TRUE_VALUES if isinstance(draft, str) else bool(draft)
+    meta["title"] = meta.get("title") or None
+    meta["date"] = meta.get("date") or None
+    return meta
+
+
+def split_front_matter(lines: Iterable[str]) -> tuple[dict, Iterator[str]]:
+    # Reads only the front matter off the head of lines and returns its metadata with the
+    # remaining lines. Without a closed front matter block every line is handed back
+    lines = iter(lines)
+    first = next(lines, None)
+    if first == None:
+        return normalize_metadata({}), iter(())
+    if first.strip() != FRONT_MATTER_DELIMITER:
+        return normalize_metadata({}), itertools.chain([first], lines)
+    head = []
+    for line in itertools.islice(lines, MAX_FRONT_MATTER_LINES):
+        if line.strip() == FRONT_MATTER_DELIMITER:
+            return normalize_metadata(parse_front_matter(head)), lines
+        head.append(line)
+    return normalize_metadata({}), itertools.chain([first], head, lines)
+
+
+def read_metadata(path: str) -> dict:
+    # Front matter, plus the first "# " heading when it has no title. Reading stops there,
+    # so the body of a page is never read for its metadata
+    with open(path) as file:
+        meta, lines = split_front_matter(file)
+        if meta["title"] == None:
+            for line in lines:
+                stripped_line = line.strip()
+                if stripped_line[0:2] == "# ":
+                    meta["title"] = stripped_line[2:].strip()
+                    break
+    # Checked once here, so feeds and sitemaps can rely on every stored date
+    if meta["date"] != None:
+        try:
+            parse_date(meta["date"])
+        except ValueError:
+            logger.warning("%s: date %r is not an ISO 8601 date, using the modification time", path, meta["date"])
+            meta["date"] = None
+    return meta
+
+
+class MetadataIndex:
+    # Metadata of every page keyed by path and kept in .cache with the (mtime, size) it was
+    # read at, so only pages that changed since the last build have their head read again.
+    # The index file itself is only loaded the first time it is needed
+    def __init__(self, path: str):
+        self.path = path
+        self._pages = None
+        self._dirty = False
+
+    def _load(self) -> dict:
+        if self._pages != None:
+            return self._pages
+        self._pages = {}
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return self._pages
+        if data.get("generator") == GENERATOR_VERSION:
+            self._pages = data.get("pages", {})
+        return self._pages
+
+    def get(self, source: str, stat: os.stat_result = None) -> dict:
+        pages = self._load()
+        if stat == None:
+            stat = os.stat(source)
+        signature = [stat.st_mtime_ns, stat.st_size]
+        cached = pages.get(source)
+        if cached != None and cached["signature"] == signature:
+            return cached["meta"]
+        meta = read_metadata(source)
+        pages[source] = {"signature": signature, "meta": meta}
+        self._dirty = True
+        return meta
+
+    def modified(self, source: str) -> int:
+        # mtime_ns the metadata of source was read at
+        self.get(source)
+        return self._pages[source]["signature"][0]
+
+    def pages(self, sources: Iterable[str]) -> dict:
+        return {source: self.get(source) for source in sources}
+
+    def prune(self, sources: Iterable[str]):
+        pages = self._load()
+        keep = set(sources)
+        for source in [source for source in pages if source not in keep]:
+            del pages[source]
+            self._dirty = True
+
+    def save(self):
+        if self._dirty == False:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {"generator": GENERATOR_VERSION, "pages": self._pages}
+        write_output(self.path, json.dumps(data, indent=1, sort_keys=True).encode("utf-8"))
+        self._dirty = False
@@ -1,18 +1,24 @@
 from htmlnode import HTMLNode
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children: list[HTMLNode], props = None):
         if tag == None:
             raise ValueError("A tag must be provided")
         super().__init__(tag, None, children, props)
 
     def to_html(self):
+        fragments = []
+        self.render_to(fragments.append)
+        return "".join(fragments)
+
+    def render_to(self, write):
         if self.tag == "":
             raise ValueError("Tag cannot be empty")
         if len(self.children) == 0:
             raise ValueError("A ParentNode must have at least a children node")
-        text = ""
+        write(f"<{self.tag}{self.props_to_html()}>")
         for child in self.children:
-            text += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{text}</{self.tag}>"
-    
+            child.render_to(write)
+        write(f"</{self.tag}>")
@@ -0,0 +1,127 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PHASES = ("discovery", "metadata", "manifest", "static copy", "parse", "serialize", "template", "write", "feeds", "search", "compress")
+
+
+class BuildProfiler:
+    # Wall time, CPU time and memory per phase and per page. Memory is tracked with
+    # tracemalloc: "blocks" is the net number of allocated blocks, "peak" the highest
+    # traced memory reached inside the phase.
+    def __init__(self, track_allocations: bool = True):
+        self.track_allocations = track_allocations
+        self.phases = {}
+        self.pages = {}
+        self.events = []
+        self.origin = time.perf_counter()
+        self._cprofile = None
+        # Highest traced memory seen by each open phase before a nested phase reset the peak
+        self._open_peaks = []
+
+    def _fold_peak(self, peak: int):
+        for index in range(len(self._open_peaks)):
+            self._open_peaks[index] = max(self._open_peaks[index], peak)
+
+    def start(self, cprofile: bool = False):
+        if self.track_allocations == True and tracemalloc.is_tracing() == False:
+            tracemalloc.start()
+        if cprofile == True:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self):
+        if self._cprofile != None:
+            self._cprofile.disable()
+        if self.track_allocations == True and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name: str, page: str = None):
+        tracing = self.track_allocations == True and tracemalloc.is_tracing()
+        if tracing:
+            blocks_before = sys.getallocatedblocks()
+            memory_before, outer_peak = tracemalloc.get_traced_memory()
+            # reset_peak would lose the peak of the phases this one is nested in
+            self._fold_peak(outer_peak)
+            tracemalloc.reset_peak()
+            self._open_peaks.append(0)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            blocks = 0
+            peak = 0
+            if tracing:
+                blocks = sys.getallocatedblocks() - blocks_before
+                traced_peak = max(self._open_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                self._fold_peak(traced_peak)
+                peak = max(0, traced_peak - memory_before)
+            self._record(name, page, wall_start, wall, cpu, blocks, peak)
+
+    def _record(self, name: str, page: str, wall_start: float, wall: float, cpu: float, blocks: int, peak: int):
+        stats = self.phases.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0, "blocks": 0, "peak": 0})
+        stats["calls"] += 1
+        stats["wall"] += wall
+        stats["cpu"] += cpu
+        stats["blocks"] += blocks
+        stats["peak"] = max(stats["peak"], peak)
+        if page != None:
+            page_stats = self.pages.setdefault(page, {"wall": 0.0, "cpu": 0.0, "phases": {}})
+            page_stats["wall"] += wall
+            page_stats["cpu"] += cpu
+            page_stats["phases"][name] = page_stats["phases"].get(name, 0.0) + wall
+        event = {
+            "name": name,
+            "cat": "page" if page != None else "build",
+            "ph": "X",
+            "ts": round((wall_start - self.origin) * 1e6, 3),
+            "dur": round(wall * 1e6, 3),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {"cpu_ms": round(cpu * 1000, 3), "blocks": blocks, "peak_bytes": peak},
+        }
+        if page != None:
+            event["args"]["page"] = page
+        self.events.append(event)
+
+    def slowest_pages(self, top: int) -> list[tuple[str, dict]]:
+        return sorted(self.pages.items(), key=lambda item: item[1]["wall"], reverse=True)[:top]
+
+    def report(self, top: int = 10) -> str:
+        lines = [f"{'phase':<12} {'calls':>6} {'wall (ms)':>10} {'cpu (ms)':>10} {'blocks':>9} {'peak (KiB)':>11}"]
+        ordered = [name for name in PHASES if name in self.phases] + sorted(set(self.phases) - set(PHASES))
+        for name in ordered:
+            stats = self.phases[name]
+            lines.append(f"{name:<12} {stats['calls']:>6} {stats['wall'] * 1000:>10.2f} {stats['cpu'] * 1000:>10.2f} {stats['blocks']:>9} {stats['peak'] / 1024:>11.1f}")
+        if len(self.pages) != 0:
+            lines.append("")
+            lines.append(f"Slowest {min(top, len(self.pages))} of {len(self.pages)} pages:")
+            for page, stats in self.slowest_pages(top):
+                breakdown = ", ".join(f"{name} {wall * 1000:.2f}" for name, wall in stats["phases"].items())
+                lines.append(f"{stats['wall'] * 1000:>10.2f} ms  {page}  ({breakdown})")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path: str):
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, file)
+
+    def write_pstats(self, path: str):
+        if self._cprofile == None:
+            raise ValueError("cProfile was not enabled for this build")
+        self._cprofile.dump_stats(path)
+
+    def write(self, path: str):
+        # .json gives a Chrome trace-event file, anything else a pstats dump
+        if path.endswith(".json"):
+            self.write_chrome_trace(path)
+        else:
+            self.write_pstats(path)
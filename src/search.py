@@ -0,0 +1,169 @@
+from feeds import page_path
+from manifest import GENERATOR_VERSION
+from metadata import MetadataIndex
+from writer import write_output
+from collections.abc import Iterable
+import json
+import os
+import re
+
+SEARCH_DIR = "search"
+SEARCH_INDEX_FILE = "index.json"
+SEARCH_CACHE_FILE = "search.json"
+SEARCH_FORMAT = 1
+# Terms are sharded by their first characters, so a query only loads the shards of its terms
+SHARD_PREFIX = 2
+TOKEN = re.compile(r"\w+")
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 32
+STOP_WORDS = frozenset("""
+    an and are as at be but by for from has have he her his in is it its of on or that the
+    their they this to was were which who will with you your
+""".split())
+SHARD_NAME_CHARACTERS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789")
+
+
+def page_terms(text: Iterable[str]) -> list[str]:
+    # The distinct terms of a page: lowercased words, without stop words, numbers
+    # and words too short or too long to be searched for
+    terms = set()
+    for fragment in text:
+        for term in TOKEN.findall(fragment.lower()):
+            if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH and term.isdigit() == False:
+                terms.add(term)
+    terms -= STOP_WORDS
+    return sorted(terms)
+
+
+def shard_name(term: str) -> str:
+    # File name of the shard holding term; characters outside a-z and 0-9 become _<hex>
+    prefix = term[:SHARD_PREFIX]
+    return "".join(character if character in SHARD_NAME_CHARACTERS else f"_{ord(character):x}" for character in prefix)
+
+
+class SearchReport:
+    def __init__(self):
+        self.pages = 0
+        self.terms = 0
+        self.shards = 0
+        self.written = []
+        self.removed = []
+        # Every file of the index, whether it was rewritten or not
+        self.files = []
+
+    def counts(self) -> dict:
+        return {
+            "pages": self.pages,
+            "terms": self.terms,
+            "shards": self.shards,
+            "written": len(self.written),
+            "removed": len(self.removed),
+        }
+
+    def summary(self) -> str:
+        return "Search: {pages} pages, {terms} terms in {shards} shards, {written} files written, {removed} removed".format(**self.counts())
+
+
+class SearchTerms:
+    # Terms of every page keyed by path and kept in .cache with the (mtime, size) of the source
+    # they were extracted from, so pages the build skips still have their terms. Like the
+    # metadata index, the file is only loaded the first time it is needed
+    def __init__(self, path: str):
+        self.path = path
+        self._pages = None
+        self._dirty = False
+
+    def _load(self) -> dict:
+        if self._pages != None:
+            return self._pages
+        self._pages = {}
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return self._pages
+        if data.get("generator") == GENERATOR_VERSION:
+            self._pages = data.get("pages", {})
+        return self._pages
+
+    def get(self, source: str, stat: os.stat_result) -> list[str]:
+        cached = self._load().get(source)
+        if cached != None and cached["signature"] == [stat.st_mtime_ns, stat.st_size]:
+            return cached["terms"]
+        return None
+
+    def put(self, source: str, stat: os.stat_result, terms: list[str]):
+        self._load()[source] = {"signature": [stat.st_mtime_ns, stat.st_size], "terms": terms}
+        self._dirty = True
+
+    def terms(self, source: str) -> list[str]:
+        cached = self._load().get(source)
+        return cached["terms"] if cached != None else []
+
+    def prune(self, sources: Iterable[str]):
+        pages = self._load()
+        keep = set(sources)
+        for source in [source for source in pages if source not in keep]:
+            del pages[source]
+            self._dirty = True
+
+    def save(self):
+        if self._dirty == False:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {"generator": GENERATOR_VERSION, "pages": self._pages}
+        write_output(self.path, json.dumps(data, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+        self._dirty = False
+
+
+def _compact_json(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+
+def _read_shards(index_path: str) -> list[str]:
+    try:
+        with open(index_path) as file:
+            return json.load(file).get("shards", [])
+    except (OSError, ValueError):
+        return []
+
+
+def write_search_index(content_dir: str, dest_dir: str, pages: list[str], terms: SearchTerms, metadata: MetadataIndex) -> SearchReport:
+    # Writes dest_dir/search/index.json, listing [path, title] per page ID and the shard names,
+    # and one <shard>.json per term prefix mapping each term to the IDs of its pages. IDs are
+    # ascending and delta encoded. Paths are relative to the basepath, so every target gets
+    # the same files. Only the shards whose content changed are rewritten
+    report = SearchReport()
+    search_dir = os.path.join(dest_dir, SEARCH_DIR)
+    index_path = os.path.join(search_dir, SEARCH_INDEX_FILE)
+    documents = []
+    shards = {}
+    last_ids = {}
+    for page_id, source in enumerate(sorted(pages)):
+        relative = os.path.relpath(source, content_dir).replace(os.sep, "/")
+        documents.append([page_path(relative), metadata.get(source)["title"]])
+        for term in terms.terms(source):
+            # Each ID is stored as the gap to the previous ID of the term
+            shards.setdefault(shard_name(term), {}).setdefault(term, []).append(page_id - last_ids.get(term, 0))
+            last_ids[term] = page_id
+    report.pages = len(documents)
+    report.terms = sum(len(shard) for shard in shards.values())
+    report.shards = len(shards)
+
+    os.makedirs(search_dir, exist_ok=True)
+    previous = _read_shards(index_path)
+    for name, shard in shards.items():
+        path = os.path.join(search_dir, name + ".json")
+        report.files.append(path)
+        if write_output(path, _compact_json(shard)):
+            report.written.append(path)
+    index = {"format": SEARCH_FORMAT, "prefix": SHARD_PREFIX, "pages": documents, "shards": sorted(shards)}
+    report.files.append(index_path)
+    if write_output(index_path, _compact_json(index)):
+        report.written.append(index_path)
+    for name in sorted(set(previous) - set(shards)):
+        path = os.path.join(search_dir, name + ".json")
+        if os.path.exists(path):
+            os.remove(path)
+            report.removed.append(path)
+    return report
@@ -0,0 +1,82 @@
+from htmlnode import HTMLNode
+import os
+import re
+
+TEMPLATE_SLOT = re.compile(r"\{\{ (\w+) \}\}")
+SRCSET_ATTRIBUTE = re.compile(r'srcset="([^"]*)"')
+URL_ATTRIBUTE = re.compile(r'(href|src)="/(?!/)')
+# A Unicode noncharacter standing in for the basepath when one render serves several targets
+BASEPATH_MARKER = "\ufdd0"
+
+_compiled_templates = {}
+
+
+def with_basepath(url: str, basepath: str) -> str:
+    # Root relative URLs get the basepath; relative, absolute and protocol relative ones are kept
+    if basepath == "/" or url.startswith("/") == False or url.startswith("//"):
+        return url
+    return basepath + url[1:]
+
+
+def _rewrite_srcset(match: re.Match, basepath: str) -> str:
+    candidates = [candidate.strip() for candidate in match.group(1).split(",")]
+    return f'srcset="{", ".join(with_basepath(candidate, basepath) for candidate in candidates)}"'
+
+
+def rewrite_basepath(text: str, basepath: str) -> str:
+    # Only used on the template text, once when it is compiled; page content gets the
+    # basepath while its link and image nodes are built
+    if basepath == "/":
+        return text
+    text = URL_ATTRIBUTE.sub(lambda match: f'{match.group(1)}="{basepath}', text)
+    if "srcset=\"" in text:
+        text = SRCSET_ATTRIBUTE.sub(lambda match: _rewrite_srcset(match, basepath), text)
+    return text
+
+
+class Template:
+    def __init__(self, text: str, basepath: str = "/"):
+        # split() alternates static chunks and slot names: chunk, slot, chunk, ..., chunk
+        parts = TEMPLATE_SLOT.split(rewrite_basepath(text, basepath))
+        self.basepath = basepath
+        self.chunks = parts[0::2]
+        self.slots = parts[1::2]
+
+    def render_to(self, write, values: dict):
+        # Slot values are plain strings or HTMLNodes, written as they are
+        write(self.chunks[0])
+        for slot, chunk in zip(self.slots, self.chunks[1:]):
+            value = values.get(slot)
+            if value == None:
+                write("{{ " + slot + " }}")
+            elif isinstance(value, HTMLNode):
+                value.render_to(write)
+            else:
+                write(value)
+            write(chunk)
+
+    def render_targets(self, values: dict, basepaths: list[str]) -> list[str]:
+        # Renders once for a template and content built with BASEPATH_MARKER, then puts each
+        # basepath where the marker is, which is much cheaper than rendering once per basepath
+        if self.basepath != BASEPATH_MARKER:
+            raise ValueError("render_targets needs a template compiled for BASEPATH_MARKER")
+        parts = self.render(values).split(BASEPATH_MARKER)
+        return [basepath.join(parts) for basepath in basepaths]
+
+    def render(self, values: dict) -> str:
+        fragments = []
+        self.render_to(fragments.append, values)
+        return "".join(fragments)
+
+
+def compile_template(template_path: str, basepath: str = "/") -> Template:
+    # Compiled once per process and basepath; recompiled only when the file changes
+    stat = os.stat(template_path)
+    key = (os.path.abspath(template_path), basepath)
+    cached = _compiled_templates.get(key)
+    if cached != None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+    with open(template_path) as file:
+        template = Template(file.read(), basepath)
+    _compiled_templates[key] = ((stat.st_mtime_ns, stat.st_size), template)
+    return template
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from assets import sync_file, sync_tree
+from manifest import BuildManifest
+
+
+class TestSyncTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "PNG" * 100)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def test_first_sync_copies_everything(self):
+        report = sync_tree(self.static, self.docs, self.manifest)
+        self.assertEqual(["index.css", os.path.join("images", "a.png")], report.copied)
+        self.assertEqual(307, report.bytes_copied)
+        with open(os.path.join(self.docs, "images", "a.png")) as file:
+            self.assertEqual("PNG" * 100, file.read())
+
+    def test_unchanged_files_are_skipped(self):
+        sync_tree(self.static, self.docs, self.manifest)
+        report = sync_tree(self.static, self.docs, self.manifest)
+        self.assertEqual([], report.copied)
+        self.assertEqual(2, len(report.skipped))
+        self.assertEqual(307, report.bytes_skipped)
+
+    def test_changed_file_is_copied(self):
+        sync_tree(self.static, self.docs, self.manifest, link="copy")
+        css = os.path.join(self.static, "index.css")
+        self.write(css, "body { color: red }")
+        report = sync_tree(self.static, self.docs, self.manifest, link="copy")
+        self.assertEqual(["index.css"], report.copied)
+
+    def test_checksum_detects_same_size_edit(self):
+        sync_tree(self.static, self.docs, self.manifest, link="copy")
+        css = os.path.join(self.static, "index.css")
+        stat = os.stat(css)
+        self.write(css, "body {!}")
+        os.utime(css, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.write(css, "body []")
+        os.utime(css, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual([], sync_tree(self.static, self.docs, self.manifest, link="copy").copied)
+        self.assertEqual(["index.css"], sync_tree(self.static, self.docs, self.manifest, link="copy", checksum=True).copied)
+
+    def test_stale_outputs_are_removed(self):
+        sync_tree(self.static, self.docs, self.manifest)
+        self.write(os.path.join(self.docs, "index.html"), "generated page")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        report = sync_tree(self.static, self.docs, self.manifest)
+        self.assertEqual([os.path.join("images", "a.png")], report.removed)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+
+    def test_hardlink(self):
+        src = os.path.join(self.static, "index.css")
+        dst = os.path.join(self.docs, "index.css")
+        method = sync_file(src, dst, "hardlink")
+        self.assertIn(method, ("hardlink", "copy"))
+        if method == "hardlink":
+            self.assertTrue(os.path.samefile(src, dst))
+        self.assertEqual([], sync_tree(self.static, self.docs, self.manifest, link="hardlink").removed)
+
+    def test_file_named_like_a_temporary_file_survives(self):
+        self.write(os.path.join(self.static, "index.css.tmp"), "kept")
+        sync_tree(self.static, self.docs, self.manifest)
+        os.utime(os.path.join(self.static, "index.css"), ns=(1, 1))
+        sync_tree(self.static, self.docs, self.manifest)
+        with open(os.path.join(self.docs, "index.css.tmp")) as file:
+            self.assertEqual("kept", file.read())
+        self.assertEqual(["index.css", "index.css.tmp"], sorted(name for name in os.listdir(self.docs) if name.startswith("index")))
+
+    def test_unknown_link_mode(self):
+        self.assertRaises(ValueError, sync_tree, self.static, self.docs, None, "symlink")
+
+
+if __name__ == "__main__":
+    unittest.main()
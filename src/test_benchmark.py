@@ -0,0 +1,48 @@
+import unittest
+from benchmark import *
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_corpora_parse(self):
+        node = markdown_to_html_node(document(2))
+        html = node.to_html()
+        self.assertIn("<h2>Section 1</h2>", html)
+        self.assertIn("<ol>", html)
+        self.assertIn("<pre><code>", html)
+        self.assertEqual(BlockType.UNORDERED_LIST, block_to_block_type(huge_list(5)))
+        self.assertEqual(BlockType.CODE, block_to_block_type(big_code_block(5)))
+
+    def test_single_pass_matches_chained_pipeline(self):
+        text = long_paragraph(3)
+        self.assertListEqual(chained_text_to_textnodes(text), text_to_textnodes(text))
+
+    def test_run_suite(self):
+        suite = run_suite([1], repeat=1, only=["to_html", "markdown_to_html_node"])
+        names = {result["name"] for result in suite["results"]}
+        self.assertEqual({"to_html", "markdown_to_html_node"}, names)
+        for result in suite["results"]:
+            self.assertGreater(result["min_seconds"], 0)
+            self.assertGreater(result["input_bytes"], 0)
+        self.assertEqual([1], suite["meta"]["sizes"])
+        self.assertEqual([], suite["memory"])
+        suite = run_suite([1], repeat=1, only=["e"])
+        self.assertEqual(([], []), (suite["results"], suite["memory"]))
+
+    def test_measure_tree_memory(self):
+        entry = measure_tree_memory(1)
+        self.assertGreater(entry["nodes"], 100)
+        self.assertGreater(entry["tree_bytes"], 0)
+
+    def test_compare(self):
+        baseline = {"results": [{"name": "to_html", "corpus": "document", "size": 1, "min_seconds": 1.0}]}
+        current = {"results": [{"name": "to_html", "corpus": "document", "size": 1, "min_seconds": 1.5},
+                               {"name": "new", "corpus": "document", "size": 1, "min_seconds": 1.0}]}
+        rows = compare(baseline, current, 0.1)
+        self.assertEqual(1, len(rows))
+        self.assertEqual(1.5, rows[0]["ratio"])
+        self.assertTrue(rows[0]["regression"])
+
+
+if __name__ == "__main__":
+    unittest.main()
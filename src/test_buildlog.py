@@ -0,0 +1,50 @@
+import io
+import json
+import logging
+import unittest
+import buildlog
+from buildlog import configure, logger, phase
+
+
+class TestBuildLog(unittest.TestCase):
+
+    def tearDown(self):
+        logger.handlers = []
+        logger.setLevel(logging.NOTSET)
+
+    def test_json_lines(self):
+        stream = io.StringIO()
+        configure("info", json_lines=True, stream=stream)
+        logger.info("Pages: %d generated", 3, extra={"fields": {"generated": 3}})
+        entry = json.loads(stream.getvalue())
+        self.assertEqual("info", entry["level"])
+        self.assertEqual("Pages: 3 generated", entry["message"])
+        self.assertEqual(3, entry["generated"])
+
+    def test_quiet_hides_info(self):
+        stream = io.StringIO()
+        configure("quiet", stream=stream)
+        logger.info("hidden")
+        logger.error("shown")
+        self.assertEqual("shown\n", stream.getvalue())
+
+    def test_debug_disabled_does_not_format(self):
+        class Exploding:
+            def __str__(self):
+                raise AssertionError("formatted a disabled debug message")
+        configure("info", stream=io.StringIO())
+        self.assertFalse(buildlog.debug_enabled())
+        logger.debug("%s", Exploding())
+
+    def test_phase_timing(self):
+        stream = io.StringIO()
+        configure("info", json_lines=True, stream=stream)
+        with phase("pages"):
+            pass
+        entry = json.loads(stream.getvalue())
+        self.assertEqual("pages", entry["phase"])
+        self.assertGreaterEqual(entry["seconds"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+import compress
+from compress import CompressReport, precompress_tree
+from manifest import BuildManifest
+
+
+class TestCompress(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "docs")
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+        self.page = os.path.join(self.root, "blog", "index.html")
+        self.write(self.page, "<p>compress me</p>" * 200)
+        self.write(os.path.join(self.root, "index.css"), "body {}")
+        self.write(os.path.join(self.root, "image.png"), "not text" * 500)
+        self.write(os.path.join(self.root, "archive.tar.gz"), "shipped as is")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def test_writes_variants_above_threshold(self):
+        report = precompress_tree(self.root, self.manifest, min_size=1024)
+        self.assertEqual([self.page + ".gz"], [variant for variant in report.compressed if variant.endswith(".gz")])
+        with gzip.open(self.page + ".gz", "rt") as file:
+            self.assertEqual("<p>compress me</p>" * 200, file.read())
+        self.assertFalse(os.path.exists(os.path.join(self.root, "index.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "image.png.gz")))
+        self.assertLess(report.bytes_out, report.bytes_in)
+
+    def test_up_to_date_variants_are_skipped(self):
+        precompress_tree(self.root, self.manifest)
+        report = precompress_tree(self.root, self.manifest)
+        self.assertEqual([], report.compressed)
+        self.assertIn(self.page + ".gz", report.skipped)
+        self.write(self.page, "<p>changed</p>" * 200)
+        os.utime(self.page, ns=(1, 1))
+        report = precompress_tree(self.root, self.manifest)
+        self.assertIn(self.page + ".gz", report.compressed)
+
+    def test_incompressible_files_are_not_compressed_again(self):
+        noise = os.path.join(self.root, "noise.txt")
+        with open(noise, "wb") as file:
+            file.write(os.urandom(4096))
+        report = precompress_tree(self.root, self.manifest)
+        self.assertFalse(os.path.exists(noise + ".gz"))
+        self.assertEqual(os.stat(noise).st_mtime_ns, self.manifest.incompressible["noise.txt.gz"])
+        with mock.patch.object(compress, "compress_file", wraps=compress.compress_file) as compressed:
+            precompress_tree(self.root, self.manifest)
+            compressed.assert_not_called()
+            os.utime(noise, ns=(1, 1))
+            precompress_tree(self.root, self.manifest)
+            self.assertIn(noise, [call.args[0] for call in compressed.call_args_list])
+        self.assertEqual(1, self.manifest.incompressible["noise.txt.gz"])
+
+    def test_parallel_matches_serial(self):
+        for index in range(6):
+            self.write(os.path.join(self.root, f"page{index}.html"), f"<p>{index}</p>" * 400)
+        report = precompress_tree(self.root, jobs=3)
+        self.assertEqual(7, len([variant for variant in report.compressed if variant.endswith(".gz")]))
+        with gzip.open(os.path.join(self.root, "page4.html.gz"), "rt") as file:
+            self.assertEqual("<p>4</p>" * 400, file.read())
+
+    def test_stale_variants_are_removed(self):
+        precompress_tree(self.root, self.manifest)
+        os.remove(self.page)
+        report = precompress_tree(self.root, self.manifest)
+        self.assertIn(self.page + ".gz", report.removed)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+        self.assertTrue(os.path.exists(os.path.join(self.root, "archive.tar.gz")))
+        self.assertEqual([], self.manifest.variants)
+
+    def test_summary(self):
+        self.assertIn("0 variants", CompressReport().summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
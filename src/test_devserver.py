@@ -0,0 +1,119 @@
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+from discovery import ContentFilter
+from devserver import LIVE_RELOAD_SCRIPT, DevSite, make_server
+from metadata import MetadataIndex
+
+
+class TestDevServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog", "tom"))
+        os.makedirs(self.static)
+        self.write(self.template, "<html><title>{{ Title }}</title><body>{{ Content }}</body></html>")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "tom", "index.md"), "# Tom")
+        self.write(os.path.join(self.content, "about.md"), "# About")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.site = DevSite(self.content, self.static, self.template)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def test_find_page(self):
+        real = lambda *parts: os.path.realpath(os.path.join(self.content, *parts))
+        self.assertEqual(real("index.md"), self.site.find_page("/"))
+        self.assertEqual(real("index.md"), self.site.find_page("/index.html"))
+        self.assertEqual(real("blog", "tom", "index.md"), self.site.find_page("/blog/tom"))
+        self.assertEqual(real("blog", "tom", "index.md"), self.site.find_page("/blog/tom/"))
+        self.assertEqual(real("about.md"), self.site.find_page("/about.html"))
+        self.assertIsNone(self.site.find_page("/index.css"))
+        self.write(os.path.join(self.tmp.name, "secret.md"), "# Secret")
+        self.assertIsNone(self.site.find_page("/../secret"))
+
+    def test_render_injects_live_reload_and_caches(self):
+        page = self.site.find_page("/")
+        data = self.site.render(page)
+        self.assertIn((LIVE_RELOAD_SCRIPT + "</body>").encode(), data)
+        self.assertIs(data, self.site.render(page))
+        self.write(page, "# Home, edited")
+        os.utime(page, ns=(0, 0))
+        self.assertIn(b"<title>Home, edited</title>", self.site.render(page))
+
+    def test_invalidate_bumps_version(self):
+        self.site.invalidate({self.template})
+        self.assertEqual(1, self.site.wait_for_change(0, 0))
+
+    def test_drafts_are_not_found(self):
+        self.write(os.path.join(self.content, "about.md"), "---\ndraft: true\n---\n# About")
+        metadata = MetadataIndex(os.path.join(self.tmp.name, ".cache", "metadata.json"))
+        self.assertIsNone(DevSite(self.content, self.static, self.template, metadata).find_page("/about"))
+        self.assertIsNotNone(DevSite(self.content, self.static, self.template, metadata, drafts=True).find_page("/about"))
+
+    def test_filtered_pages_are_not_found(self):
+        self.write(os.path.join(self.content, ".hidden.md"), "# Hidden")
+        self.assertIsNone(self.site.find_page("/.hidden"))
+        ignore = os.path.join(self.content, ".contentignore")
+        self.write(ignore, "blog/\n")
+        self.site.invalidate({ignore})
+        self.assertIsNone(self.site.find_page("/blog/tom"))
+        site = DevSite(self.content, self.static, self.template, content_filter=ContentFilter(self.content, exclude=["about.md"]))
+        self.assertIsNone(site.find_page("/about"))
+        self.assertIsNotNone(site.find_page("/"))
+
+    def test_head_and_live_reload_outside_the_pool(self):
+        server = make_server(self.site, port=0, workers=1)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            base = f"http://localhost:{server.server_address[1]}"
+            request = urllib.request.Request(base + "/blog/tom", method="HEAD")
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual("text/html; charset=utf-8", response.headers["Content-Type"])
+                self.assertEqual(b"", response.read())
+            results = []
+            waiting = threading.Thread(target=lambda: results.append(urllib.request.urlopen(base + "/__livereload?version=0", timeout=10).read()))
+            waiting.start()
+            # The only request thread is still free while the live reload request waits
+            with urllib.request.urlopen(base + "/", timeout=5) as response:
+                self.assertIn(b"<title>Home</title>", response.read())
+            self.site.invalidate({self.template})
+            waiting.join(10)
+            self.assertEqual([b"1"], results)
+        finally:
+            server.shutdown()
+            self.site.close()
+            server.server_close()
+
+    def test_serves_pages_and_static_files(self):
+        server = make_server(self.site, port=0, workers=2)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            base = f"http://localhost:{server.server_address[1]}"
+            with urllib.request.urlopen(base + "/blog/tom") as response:
+                self.assertIn(b"<title>Tom</title>", response.read())
+            with urllib.request.urlopen(base + "/index.css") as response:
+                self.assertEqual(b"body {}", response.read())
+            with urllib.request.urlopen(base + "/__livereload?version=") as response:
+                self.assertEqual(b"0", response.read())
+        finally:
+            server.shutdown()
+            self.site.close()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
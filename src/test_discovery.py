@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from discovery import ContentFilter, is_hidden_or_temp
+
+
+class TestDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        for relative in ("index.md", "notes.txt", "image.png", ".hidden.md", "index.md~", "#index.md#", ".#index.md",
+                         "post.md.swp", "blog/a.md", "blog/b.draft.md", "blog/.git/c.md", "drafts/d.md",
+                         "blog/drafts/e.md", "blog/old/f.md"):
+            path = os.path.join(self.root, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write("# Page")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def walk(self, content_filter):
+        return sorted(content_filter.relative(entry.path) for entry in content_filter.walk())
+
+    def test_hidden_or_temp(self):
+        for name in (".git", "page.md~", "page.swp", "#page.md#", ".#page.md", "page.bak"):
+            self.assertTrue(is_hidden_or_temp(name))
+        self.assertFalse(is_hidden_or_temp("page.md"))
+
+    def test_walk_only_yields_markdown(self):
+        self.assertEqual(["blog/a.md", "blog/b.draft.md", "blog/drafts/e.md", "blog/old/f.md", "drafts/d.md", "index.md"],
+                         self.walk(ContentFilter(self.root)))
+
+    def test_include_and_exclude_globs(self):
+        content_filter = ContentFilter(self.root, include=["*.md", "*.txt"], exclude=["*.draft.md", "drafts/", "blog/old/*"])
+        self.assertEqual(["blog/a.md", "index.md", "notes.txt"], self.walk(content_filter))
+        self.assertFalse(content_filter.accepts("blog/drafts/e.md"))
+        self.assertTrue(content_filter.accepts("blog/a.md"))
+
+    def test_ignore_file(self):
+        with open(os.path.join(self.root, ".contentignore"), "w") as file:
+            file.write("# private pages\n\nblog/\n")
+        content_filter = ContentFilter(self.root)
+        self.assertEqual(["drafts/d.md", "index.md"], self.walk(content_filter))
+        os.remove(os.path.join(self.root, ".contentignore"))
+        content_filter.reload()
+        self.assertIn("blog/a.md", self.walk(content_filter))
+
+
+if __name__ == "__main__":
+    unittest.main()
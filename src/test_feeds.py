@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import feeds
+from feeds import metadata_datetime, page_url, write_site_feeds
+from metadata import MetadataIndex
+
+
+class TestFeeds(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.dest = os.path.join(self.root, "docs")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.pages = [
+            self.write("index.md", "# Home & Co", 100),
+            self.write("about.md", "# About", 200),
+            self.write("blog/old.md", "---\ndate: 2020-01-01\ntags: [a, \"b\"]\n---\n# Old", 300),
+            self.write("blog/new.md", "---\ntitle: New <post>\ndate: 2024-02-03T10:00:00Z\n---\n# Heading", 400),
+            self.write("blog/undated.md", "# Undated", 1800000000),
+        ]
+        self.metadata = MetadataIndex(os.path.join(self.root, ".cache", "metadata.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative, text, mtime):
+        path = os.path.join(self.content, relative)
+        with open(path, "w") as file:
+            file.write(text)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def build(self, **kwargs):
+        return write_site_feeds(self.content, self.dest, "/site/", "https://example.com/", self.pages, self.metadata, **kwargs)
+
+    def read(self, name):
+        with open(os.path.join(self.dest, name)) as file:
+            return file.read()
+
+    def test_page_url(self):
+        self.assertEqual("https://example.com/", page_url("https://example.com", "/", "index.md"))
+        self.assertEqual("https://example.com/site/blog/", page_url("https://example.com/", "/site/", "blog/index.md"))
+        self.assertEqual("https://example.com/site/blog/post.html", page_url("https://example.com", "/site/", "blog/post.md"))
+
+    def test_metadata_datetime(self):
+        self.assertEqual("2020-01-01T00:00:00Z", metadata_datetime("2020-01-01"))
+        self.assertEqual("2024-02-03T08:00:00Z", metadata_datetime("2024-02-03T10:00:00+02:00"))
+
+    def test_sitemap_lists_every_page(self):
+        report = self.build()
+        sitemap = self.read("sitemap.xml")
+        self.assertEqual(5, report.urls)
+        self.assertIn("<url><loc>https://example.com/site/about.html</loc><lastmod>1970-01-01T00:03:20Z</lastmod></url>", sitemap)
+        self.assertIn("<loc>https://example.com/site/</loc>", sitemap)
+
+    def test_feed_lists_newest_section_pages(self):
+        report = self.build(feed_entries=2)
+        feed = self.read("feed.xml")
+        self.assertEqual(2, report.entries)
+        self.assertIn("<title>Home &amp; Co</title>", feed)
+        self.assertIn("<title>New &lt;post&gt;</title><updated>2024-02-03T10:00:00Z</updated><published>2024-02-03T10:00:00Z</published>", feed)
+        self.assertNotIn("about.html", feed)
+        self.assertNotIn("old.html", feed)
+        self.assertLess(feed.index("undated.html"), feed.index("new.html"))
+        report = self.build()
+        self.assertIn('<category term="a"/><category term="b"/>', self.read("feed.xml"))
+
+    def test_invalid_dates_use_the_modification_time(self):
+        self.pages.append(self.write("blog/misdated.md", "---\ndate: May 1, 2024\n---\n# Misdated", 500))
+        with self.assertLogs("static_generator", "WARNING"):
+            self.build()
+        self.assertIn("<title>Misdated</title><updated>1970-01-01T00:08:20Z</updated><link", self.read("feed.xml"))
+
+    def test_unchanged_files_are_not_rewritten(self):
+        self.build()
+        os.utime(os.path.join(self.dest, "sitemap.xml"), ns=(0, 0))
+        report = self.build()
+        self.assertEqual([], report.written)
+        self.assertEqual(0, os.stat(os.path.join(self.dest, "sitemap.xml")).st_mtime_ns)
+        self.write("about.md", "# About us", 600)
+        report = self.build()
+        self.assertEqual([os.path.join(self.dest, "sitemap.xml")], report.written)
+
+    def test_large_sites_get_a_sitemap_index(self):
+        with mock.patch.object(feeds, "SITEMAP_MAX_URLS", 2):
+            self.build()
+        self.assertIn("<sitemap><loc>https://example.com/site/sitemap-3.xml</loc></sitemap>", self.read("sitemap.xml"))
+        self.assertEqual(1, self.read("sitemap-3.xml").count("<url>"))
+        report = self.build()
+        self.assertEqual(3, len(report.removed))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "sitemap-1.xml")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import fragcache
+from fragcache import FragmentCache, open_fragment_cache
+from mdparser import BlockType, markdown_to_html_node
+
+
+class TestFragmentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "fragments")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_type_and_lines(self):
+        cache = FragmentCache()
+        key = cache.key(BlockType.PARAGRAPH, ["a", "b"])
+        self.assertEqual(key, cache.key(BlockType.PARAGRAPH, ["a", "b"]))
+        self.assertNotEqual(key, cache.key(BlockType.QUOTE, ["a", "b"]))
+        self.assertNotEqual(key, cache.key(BlockType.PARAGRAPH, ["a b"]))
+        with mock.patch.object(fragcache, "GENERATOR_VERSION", "next"):
+            self.assertNotEqual(key, cache.key(BlockType.PARAGRAPH, ["a", "b"]))
+
+    def test_memory_lru_evicts_oldest(self):
+        cache = FragmentCache(memory_entries=2)
+        cache.put("a", "<p>a</p>")
+        cache.put("b", "<p>b</p>")
+        self.assertEqual("<p>a</p>", cache.get("a"))
+        cache.put("c", "<p>c</p>")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual("<p>a</p>", cache.get("a"))
+        self.assertEqual((2, 1), (cache.hits, cache.misses))
+
+    def test_disk_entries_survive_a_new_cache(self):
+        FragmentCache(self.directory).put("ab12", "<p>x</p>")
+        cache = FragmentCache(self.directory)
+        self.assertEqual("<p>x</p>", cache.get("ab12"))
+        with mock.patch.object(fragcache, "GENERATOR_VERSION", "next"):
+            self.assertIsNone(FragmentCache(self.directory).get("ab12"))
+
+    def test_trim_removes_old_versions_and_least_recent_files(self):
+        cache = FragmentCache(self.directory, max_bytes=25)
+        with mock.patch.object(fragcache, "GENERATOR_VERSION", "0"):
+            FragmentCache(self.directory).put("old", "<p>old</p>")
+        for index, key in enumerate(["k1", "k2", "k3"]):
+            cache.put(key, "0123456789")
+            path = cache._path(key)
+            os.utime(path, ns=(index, index))
+        os.utime(cache._path("k1"), ns=(10, 10))
+        self.assertEqual(1, cache.trim())
+        self.assertEqual([f"v{fragcache.GENERATOR_VERSION}"], os.listdir(self.directory))
+        self.assertFalse(os.path.exists(cache._path("k2")))
+        self.assertTrue(os.path.exists(cache._path("k1")))
+
+    def test_open_fragment_cache_is_shared(self):
+        self.assertIs(open_fragment_cache(self.directory, 10, 5), open_fragment_cache(self.directory, 10, 5))
+
+    def test_markdown_to_html_node_uses_cache(self):
+        markdown = "# Title\n\nSome **bold** text\n\n- one\n- two"
+        expected = markdown_to_html_node(markdown).to_html()
+        cache = FragmentCache(self.directory)
+        self.assertEqual(expected, markdown_to_html_node(markdown, cache).to_html())
+        self.assertEqual((0, 3), (cache.hits, cache.misses))
+        edited = markdown.replace("Some", "More")
+        self.assertEqual(markdown_to_html_node(edited).to_html(), markdown_to_html_node(edited, cache).to_html())
+        self.assertEqual((2, 4), (cache.hits, cache.misses))
+
+
+    def test_cached_links_depend_on_basepath(self):
+        markdown = "# Title\n\n[Home](/)"
+        cache = FragmentCache(self.directory)
+        markdown_to_html_node(markdown, cache)
+        self.assertIn('href="/site/"', markdown_to_html_node(markdown, cache, basepath="/site/").to_html())
+        self.assertEqual((1, 3), (cache.hits, cache.misses))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,6 +13,20 @@ class TestHTMLNode(unittest.TestCase):
         node = HTMLNode("a", "Google")
         self.assertEqual(node.props_to_html(), "" )
 
+    def test_nodes_have_no_instance_dict(self):
+        from leafnode import LeafNode
+        from parentnode import ParentNode
+        leaf = LeafNode("b", "bold")
+        parent = ParentNode("p", [leaf])
+        for node in (HTMLNode("a", "Google"), leaf, parent):
+            self.assertFalse(hasattr(node, "__dict__"))
+        self.assertIsNone(leaf.children)
+        self.assertIsNone(parent.value)
+
+    def test_tag_is_interned(self):
+        tag = "".join(["sp", "an"])
+        self.assertIs(HTMLNode(tag, "x").tag, HTMLNode("span", "y").tag)
+
         
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,158 @@
+import json
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from assets import sync_tree
+from images import ImageIndex, ImageOptimizer, iter_png_chunks, optimize_png, png_size, _png_chunk, PNG_SIGNATURE
+from leafnode import text_node_to_html_node
+from manifest import BuildManifest
+from mdparser import generate_pages_recursive
+from textnode import TextNode, TextType
+
+
+def make_png(width, height, level=0):
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    scanlines = b"".join(b"\x00" + bytes([row % 256, 0, 0]) * width for row in range(height))
+    return (PNG_SIGNATURE + _png_chunk(b"IHDR", header) + _png_chunk(b"tEXt", b"Comment\x00made by a test")
+            + _png_chunk(b"IDAT", zlib.compress(scanlines, level)) + _png_chunk(b"IEND", b""))
+
+
+class TestImages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.cache = os.path.join(self.tmp.name, ".cache", "images")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.source = os.path.join(self.static, "images", "pic.png")
+        with open(self.source, "wb") as file:
+            file.write(make_png(40, 30))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_optimize_png_is_lossless(self):
+        data = make_png(40, 30)
+        optimized = optimize_png(data)
+        self.assertLess(len(optimized), len(data))
+        self.assertEqual((40, 30), png_size(optimized))
+        idat = lambda png: zlib.decompress(b"".join(chunk for chunk_type, chunk in iter_png_chunks(png) if chunk_type == b"IDAT"))
+        self.assertEqual(idat(data), idat(optimized))
+        self.assertEqual([b"IHDR", b"IDAT", b"IEND"], [chunk_type for chunk_type, chunk in iter_png_chunks(optimized)])
+
+    def test_optimized_png_is_returned_unchanged_when_not_smaller(self):
+        data = optimize_png(make_png(40, 30))
+        self.assertIs(data, optimize_png(data))
+
+    def test_sync_tree_uses_the_cache(self):
+        optimizer = ImageOptimizer(self.cache)
+        report = sync_tree(self.static, self.dest, optimizer=optimizer)
+        optimizer.save()
+        output = os.path.join(self.dest, "images", "pic.png")
+        self.assertEqual(["images/pic.png"], [path.replace(os.sep, "/") for path in report.copied])
+        self.assertLess(os.path.getsize(output), os.path.getsize(self.source))
+        self.assertEqual([self.source], optimizer.processed)
+
+        report = sync_tree(self.static, self.dest, optimizer=ImageOptimizer(self.cache))
+        self.assertEqual(1, len(report.skipped))
+        os.remove(output)
+        optimizer = ImageOptimizer(self.cache)
+        sync_tree(self.static, self.dest, optimizer=optimizer)
+        self.assertEqual([], optimizer.processed)
+        self.assertTrue(os.path.exists(output))
+
+    def test_removed_image_is_forgotten(self):
+        optimizer = ImageOptimizer(self.cache)
+        sync_tree(self.static, self.dest, optimizer=optimizer)
+        os.remove(self.source)
+        sync_tree(self.static, self.dest, optimizer=optimizer)
+        self.assertEqual({}, optimizer.images)
+        self.assertEqual([], os.listdir(self.cache))
+
+    def test_image_index_adds_dimensions(self):
+        optimizer = ImageOptimizer(self.cache)
+        sync_tree(self.static, self.dest, optimizer=optimizer)
+        optimizer.save()
+        images = ImageIndex(optimizer.index_path)
+        self.assertEqual({"width": "40", "height": "30"}, images.attributes("/images/pic.png"))
+        self.assertEqual({}, images.attributes("https://example.com/images/pic.png"))
+        node = text_node_to_html_node(TextNode("A pic", TextType.IMAGE, "/images/pic.png"), images)
+        self.assertEqual('<img src="/images/pic.png" alt="A pic" width="40" height="30">', node.to_html())
+
+    def test_variants_follow_the_configured_widths(self):
+        optimizer = ImageOptimizer(self.cache)
+        sync_tree(self.static, self.dest, optimizer=optimizer)
+        # As synced by an earlier build with a 20px variant
+        stale = os.path.join(self.dest, "images", "pic-20w.png")
+        with open(stale, "wb") as file:
+            file.write(b"")
+        stat = os.stat(self.source)
+        os.utime(stale, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        optimizer.images["images/pic.png"]["variants"] = [[20, 15]]
+        self.assertFalse(optimizer.is_unchanged(self.source, stat, self.dest, os.path.join("images", "pic.png")))
+        report = sync_tree(self.static, self.dest, optimizer=optimizer)
+        self.assertEqual(1, len(report.copied))
+        self.assertFalse(os.path.exists(stale))
+        self.assertEqual([], optimizer.images["images/pic.png"]["variants"])
+
+    def test_pages_only_depend_on_their_images(self):
+        content = os.path.join(self.tmp.name, "content")
+        template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(content)
+        with open(template, "w") as file:
+            file.write("{{ Title }}{{ Content }}")
+        with open(os.path.join(content, "index.md"), "w") as file:
+            file.write("# Home\n\n![A pic](/images/pic.png)")
+        with open(os.path.join(content, "about.md"), "w") as file:
+            file.write("# About")
+        manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+
+        def build(sizes):
+            index_path = os.path.join(self.cache, "index.json")
+            os.makedirs(self.cache, exist_ok=True)
+            images = {name: {"width": width, "height": 30, "variants": []} for name, width in sizes.items()}
+            with open(index_path, "w") as file:
+                json.dump({"images": images}, file)
+            return generate_pages_recursive(content, template, self.dest, "/", manifest, images=ImageIndex(index_path))
+
+        report = build({"images/pic.png": 40})
+        self.assertEqual(["/images/pic.png"], manifest.pages[os.path.join(content, "index.md")]["image_urls"])
+        self.assertNotIn("images", manifest.pages[os.path.join(content, "about.md")])
+        report = build({"images/pic.png": 40, "images/other.png": 10})
+        self.assertEqual([], report.generated)
+        report = build({"images/pic.png": 50, "images/other.png": 10})
+        self.assertEqual([os.path.join(content, "index.md")], report.generated)
+        with open(os.path.join(self.dest, "index.html")) as file:
+            self.assertIn('width="50"', file.read())
+
+    def test_enabling_images_rebuilds_pages_that_show_them(self):
+        content = os.path.join(self.tmp.name, "content")
+        template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(content)
+        with open(template, "w") as file:
+            file.write("{{ Title }}{{ Content }}")
+        with open(os.path.join(content, "index.md"), "w") as file:
+            file.write("# Home\n\n![A pic](/images/pic.png)")
+        with open(os.path.join(content, "about.md"), "w") as file:
+            file.write("# About")
+        manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+        generate_pages_recursive(content, template, self.dest, "/", manifest)
+        optimizer = ImageOptimizer(self.cache)
+        sync_tree(self.static, self.dest, optimizer=optimizer)
+        optimizer.save()
+        report = generate_pages_recursive(content, template, self.dest, "/", manifest, images=ImageIndex(optimizer.index_path))
+        self.assertEqual([os.path.join(content, "index.md")], report.generated)
+        with open(os.path.join(self.dest, "index.html")) as file:
+            self.assertIn('width="40" height="30"', file.read())
+
+    def test_srcset_lists_variants(self):
+        images = ImageIndex(os.path.join(self.cache, "missing.json"))
+        images.images = {"images/pic.png": {"width": 40, "height": 30, "variants": [[20, 15]]}}
+        self.assertEqual("/images/pic-20w.png 20w, /images/pic.png 40w", images.attributes("/images/pic.png")["srcset"])
+
+
+if __name__ == "__main__":
+    unittest.main()
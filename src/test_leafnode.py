@@ -38,4 +38,10 @@ class TestLeafNode(unittest.TestCase):
         html_node = text_node_to_html_node(node)
         self.assertEqual(html_node.tag, "img")
         self.assertEqual(html_node.value, "")
-        self.assertEqual(html_node.props, {"src":"/home/nice_pics/","alt":"This is a text node"})
\ No newline at end of file
+        self.assertEqual(html_node.props, {"src":"/home/nice_pics/","alt":"This is a text node"})
+
+    def test_node_conversion_basepath(self):
+        link = text_node_to_html_node(TextNode("Home", TextType.LINK, "/blog/"), basepath="/site/")
+        self.assertEqual({"href": "/site/blog/"}, link.props)
+        image = text_node_to_html_node(TextNode("Pic", TextType.IMAGE, "pics/a.png"), basepath="/site/")
+        self.assertEqual({"src": "pics/a.png", "alt": "Pic"}, image.props)
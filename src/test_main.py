@@ -1,5 +1,70 @@
 from main import *
+import contextlib
+import io
+import os
+import tempfile
 import unittest
 
 
+class TestTargets(unittest.TestCase):
 
+    def parse(self, *argv):
+        with contextlib.redirect_stderr(io.StringIO()):
+            return parse_args(list(argv))
+
+    def test_similar_directories_get_their_own_manifest(self):
+        args = self.parse("--target", "/=site-a", "--target", "/x/=site_a")
+        targets = build_targets(args, BuildManifest(os.path.join(CACHE_DIR, MANIFEST_FILE)))
+        self.assertEqual(3, len({target.manifest.path for target in targets}))
+
+    def test_unsafe_targets_are_rejected(self):
+        for dest_dir in (".", "..", "docs", "./content", "static/", ".cache"):
+            with self.assertRaises(SystemExit):
+                self.parse("--target", f"/={dest_dir}")
+        with self.assertRaises(SystemExit):
+            self.parse("--target", "/=out", "--target", "/x/=./out")
+        self.assertEqual(["/=out/site"], self.parse("--target", "/=out/site").target)
+
+
+class TestBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        os.makedirs(os.path.join(CONTENT_DIR, "blog"))
+        os.makedirs(STATIC_DIR)
+        self.write(TEMPLATE_PATH, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(CONTENT_DIR, "index.md"), "# Home\n\nHobbits")
+        self.write(os.path.join(CONTENT_DIR, "blog", "post.md"), "# Post\n\nSecond breakfast")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def build(self, *argv):
+        with self.assertLogs("static_generator", "INFO"):
+            return build(parse_args(["-j", "1", *argv]), BuildManifest(os.path.join(CACHE_DIR, MANIFEST_FILE)))
+
+    def test_search_index_is_removed_when_disabled(self):
+        self.build("--search")
+        self.assertTrue(os.path.exists(os.path.join(PUBLIC_DIR, "search", "index.json")))
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(PUBLIC_DIR, "search")))
+        self.assertEqual({}, BuildManifest(os.path.join(CACHE_DIR, MANIFEST_FILE)).outputs)
+
+    def test_feeds_are_removed_when_disabled(self):
+        self.build("--site-url", "https://example.com")
+        self.assertTrue(os.path.exists(os.path.join(PUBLIC_DIR, "sitemap.xml")))
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(PUBLIC_DIR, "sitemap.xml")))
+        self.assertFalse(os.path.exists(os.path.join(PUBLIC_DIR, "feed.xml")))
+        self.assertTrue(os.path.exists(os.path.join(PUBLIC_DIR, "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import os
+import tempfile
+import unittest
+from manifest import BuildManifest, file_hash, source_version
+from metadata import MetadataIndex
+from mdparser import BuildTarget, generate_pages_recursive, generate_site
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestBuildManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest_path = os.path.join(self.root, ".cache", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, TEMPLATE)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\nPosts")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def build(self, force=False):
+        manifest = BuildManifest(self.manifest_path)
+        generate_pages_recursive(self.content, self.template, self.dest, "/", manifest, force)
+        return manifest
+
+    def test_unchanged_pages_are_skipped(self):
+        self.build()
+        output = os.path.join(self.dest, "index.html")
+        os.utime(output, (0, 0))
+        self.build()
+        self.assertEqual(0, os.path.getmtime(output))
+
+    def test_changed_source_is_rebuilt(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nChanged")
+        self.build()
+        with open(os.path.join(self.dest, "index.html")) as file:
+            self.assertIn("Changed", file.read())
+
+    def test_template_change_rebuilds_everything(self):
+        self.build()
+        output = os.path.join(self.dest, "blog", "index.html")
+        os.utime(output, (0, 0))
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.build()
+        self.assertNotEqual(0, os.path.getmtime(output))
+
+    def test_force_rebuilds_everything(self):
+        self.build()
+        output = os.path.join(self.dest, "index.html")
+        self.write(output, "stale")
+        self.build(force=True)
+        with open(output) as file:
+            self.assertIn("Welcome", file.read())
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        manifest = self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "index.html")))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+        self.assertEqual([os.path.join(self.content, "index.md").replace(os.sep, "/")],
+                         [path.replace(os.sep, "/") for path in manifest.pages])
+
+    def test_generated_pages_are_logged(self):
+        with self.assertLogs("static_generator", "DEBUG") as logs:
+            self.build()
+        self.assertIn(f"Generated {os.path.join(self.dest, 'index.html')} from {os.path.join(self.content, 'index.md')} (written)", "\n".join(logs.output))
+
+    def test_removal_stops_at_the_output_directory(self):
+        self.build()
+        os.remove(os.path.join(self.content, "index.md"))
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        self.build()
+        self.assertEqual([], os.listdir(self.dest))
+
+    def test_failed_page_does_not_abort_build(self):
+        self.write(os.path.join(self.content, "blog", "index.md"), "No title here")
+        report = generate_pages_recursive(self.content, self.template, self.dest, "/", BuildManifest(self.manifest_path))
+        self.assertEqual([self.content + "/index.md"], report.generated)
+        self.assertEqual(1, len(report.errors))
+        self.assertEqual(self.content + "/blog/index.md", report.errors[0][0])
+        self.assertIn("ValueError", report.errors[0][1])
+        self.assertIn("1 failed", report.summary())
+
+    def test_parallel_build_matches_serial_build(self):
+        for index in range(8):
+            self.write(os.path.join(self.content, "blog", f"post{index}.md"), f"# Post {index}\n\nText **{index}**")
+        serial = generate_pages_recursive(self.content, self.template, self.dest, "/")
+        with open(os.path.join(self.dest, "blog", "post3.html")) as file:
+            serial_html = file.read()
+        os.remove(os.path.join(self.dest, "blog", "post3.html"))
+        parallel = generate_pages_recursive(self.content, self.template, self.dest, "/", jobs=4)
+        self.assertEqual(serial.generated, parallel.generated)
+        self.assertEqual(sorted(parallel.generated), parallel.generated)
+        with open(os.path.join(self.dest, "blog", "post3.html")) as file:
+            self.assertEqual(serial_html, file.read())
+
+    def test_only_markdown_pages_are_built(self):
+        self.write(os.path.join(self.content, "notes.txt"), "# Notes")
+        self.write(os.path.join(self.content, "index.md~"), "# Backup")
+        report = generate_pages_recursive(self.content, self.template, self.dest, "/")
+        self.assertEqual([self.content + "/blog/index.md", self.content + "/index.md"], report.generated)
+        self.assertEqual(["blog", "index.html"], sorted(os.listdir(self.dest)))
+
+    def test_site_is_built_for_every_target(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[Blog](/blog/)")
+        mirror = os.path.join(self.root, "mirror")
+        targets = [BuildTarget("/", self.dest, BuildManifest(self.manifest_path)),
+                   BuildTarget("/site/", mirror, BuildManifest(os.path.join(self.root, ".cache", "mirror.json")))]
+        generate_site(self.content, self.template, targets)
+        with open(os.path.join(mirror, "index.html")) as file:
+            self.assertIn("<a href=\"/site/blog/\">", file.read())
+        with open(os.path.join(self.dest, "index.html")) as file:
+            self.assertIn("<a href=\"/blog/\">", file.read())
+        self.assertEqual(2, len(targets[1].report.generated))
+        os.remove(os.path.join(mirror, "blog", "index.html"))
+        targets[1].manifest.pages.pop(self.content + "/blog/index.md")
+        targets = [BuildTarget("/", self.dest, BuildManifest(self.manifest_path)),
+                   BuildTarget("/site/", mirror, targets[1].manifest)]
+        generate_site(self.content, self.template, targets)
+        self.assertEqual([], targets[0].report.generated)
+        self.assertEqual([self.content + "/blog/index.md"], targets[1].report.generated)
+        self.assertTrue(os.path.exists(os.path.join(mirror, "blog", "index.html")))
+
+    def test_drafts_are_left_out(self):
+        self.write(os.path.join(self.content, "blog", "draft.md"), "---\ntitle: Soon\ndraft: true\n---\n\nNot yet")
+        index = MetadataIndex(os.path.join(self.root, ".cache", "metadata.json"))
+        report = generate_pages_recursive(self.content, self.template, self.dest, "/", BuildManifest(self.manifest_path), metadata=index)
+        self.assertNotIn(self.content + "/blog/draft.md", report.generated)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "draft.html")))
+        targets = [BuildTarget("/", self.dest, BuildManifest(self.manifest_path))]
+        generate_site(self.content, self.template, targets, metadata=index, drafts=True)
+        with open(os.path.join(self.dest, "blog", "draft.html")) as file:
+            self.assertEqual("<title>Soon</title><body><div><p>Not yet</p></div></body>", file.read())
+
+    def test_invalid_front_matter_fails_only_its_page(self):
+        self.build()
+        self.write(os.path.join(self.content, "blog", "index.md"), "---\nIntro paragraph without colon\n---\n# Blog")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nChanged")
+        index = MetadataIndex(os.path.join(self.root, ".cache", "metadata.json"))
+        manifest = BuildManifest(self.manifest_path)
+        report = generate_pages_recursive(self.content, self.template, self.dest, "/", manifest, metadata=index)
+        self.assertEqual([self.content + "/index.md"], report.generated)
+        self.assertEqual([self.content + "/blog/index.md"], [source for source, error in report.errors])
+        self.assertIn("ValueError", report.errors[0][1])
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "blog", "index.html")))
+        self.assertIn(self.content + "/blog/index.md", BuildManifest(self.manifest_path).pages)
+
+    def test_manifest_round_trip(self):
+        manifest = self.build()
+        reloaded = BuildManifest(self.manifest_path)
+        self.assertEqual(manifest.pages, reloaded.pages)
+        entry = reloaded.pages[self.content + "/index.md"]
+        self.assertEqual(file_hash(self.template), entry["template_hash"])
+        self.assertEqual("/", entry["basepath"])
+
+    def test_source_version_follows_the_code(self):
+        code = os.path.join(self.root, "code")
+        os.makedirs(code)
+        self.write(os.path.join(code, "page.py"), "A = 1")
+        version = source_version(code)
+        self.write(os.path.join(code, "test_page.py"), "B = 2")
+        self.assertEqual(version, source_version(code))
+        self.write(os.path.join(code, "page.py"), "A = 2")
+        self.assertNotEqual(version, source_version(code))
+
+
+if __name__ == "__main__":
+    unittest.main()
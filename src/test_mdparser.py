@@ -1,3 +1,4 @@
+import io
 import unittest
 from mdparser import *
 
@@ -504,6 +505,25 @@ class TestMDParser(unittest.TestCase):
         ]
         self.assertListEqual(expected, new_nodes)
 
+    def test_split_repeated_alt_text(self):
+        node = TextNode("![pic](a.png) then [pic](b.html) then ![pic](c.png)", TextType.NORMAL)
+        expected = [
+            TextNode("pic", TextType.IMAGE, "a.png"),
+            TextNode(" then [pic](b.html) then ", TextType.NORMAL),
+            TextNode("pic", TextType.IMAGE, "c.png"),
+        ]
+        self.assertListEqual(expected, split_nodes_image([node]))
+
+    def test_split_repeated_link_text_and_url(self):
+        node = TextNode("[x](u) and (u) [x](u) end", TextType.NORMAL)
+        expected = [
+            TextNode("x", TextType.LINK, "u"),
+            TextNode(" and (u) ", TextType.NORMAL),
+            TextNode("x", TextType.LINK, "u"),
+            TextNode(" end", TextType.NORMAL),
+        ]
+        self.assertListEqual(expected, split_nodes_link([node]))
+
     def test_split_does_not_split_images(self):
         """Prueba que la sintaxis de imagen no se confunda con un enlace."""
         node = TextNode("Esto es ![una imagen](img.png), no un enlace.", TextType.NORMAL)
@@ -683,6 +703,54 @@ class TestMDParser(unittest.TestCase):
         ]
         self.assertListEqual(expected, nodes)
 
+    def test_underscore_inside_link_url(self):
+        md_text = "See [my_page](some_url_here) and _this_"
+        nodes = text_to_textnodes(md_text)
+        expected = [
+            TextNode("See ", TextType.NORMAL),
+            TextNode("my_page", TextType.LINK, "some_url_here"),
+            TextNode(" and ", TextType.NORMAL),
+            TextNode("this", TextType.ITALIC),
+        ]
+        self.assertListEqual(expected, nodes)
+
+    def test_code_span_is_literal(self):
+        md_text = "Use `**kwargs` and `a_b_c` here"
+        nodes = text_to_textnodes(md_text)
+        expected = [
+            TextNode("Use ", TextType.NORMAL),
+            TextNode("**kwargs", TextType.CODE),
+            TextNode(" and ", TextType.NORMAL),
+            TextNode("a_b_c", TextType.CODE),
+            TextNode(" here", TextType.NORMAL),
+        ]
+        self.assertListEqual(expected, nodes)
+
+    def test_escaped_delimiters(self):
+        md_text = "Not \\_italic\\_ but _real \\_ one_ and \\[no link](x)"
+        nodes = text_to_textnodes(md_text)
+        expected = [
+            TextNode("Not _italic_ but ", TextType.NORMAL),
+            TextNode("real _ one", TextType.ITALIC),
+            TextNode(" and [no link](x)", TextType.NORMAL),
+        ]
+        self.assertListEqual(expected, nodes)
+
+    def test_nested_markup_is_literal(self):
+        nodes = text_to_textnodes("**bold _it_** and [**l**](/x)")
+        expected = [
+            TextNode("bold _it_", TextType.BOLD),
+            TextNode(" and ", TextType.NORMAL),
+            TextNode("**l**", TextType.LINK, "/x"),
+        ]
+        self.assertListEqual(expected, nodes)
+
+    def test_empty_and_unmatched_delimiters(self):
+        md_text = "Text with **** empty bold, a single * star and `` plus _open"
+        nodes = text_to_textnodes(md_text)
+        expected = [TextNode(md_text, TextType.NORMAL)]
+        self.assertListEqual(expected, nodes)
+
 
 
 
@@ -830,6 +898,25 @@ Block 2 line 2 \t\n\n\t Block 3 \t"""
         expected = ["Line one\nLine two\nStill the same block."]
         self.assertListEqual(expected, blocks)
 
+    def test_code_block_with_blank_line(self):
+        md = "Intro\n\n```\nfirst()\n\n\nsecond()\n```\n\nOutro"
+        blocks = markdown_to_blocks(md)
+        expected = ["Intro", "```\nfirst()\n\n\nsecond()\n```", "Outro"]
+        self.assertListEqual(expected, blocks)
+
+    def test_iter_blocks_from_file_object(self):
+        source = io.StringIO("# Title\n\n- one\n- two\n\n```\na\n\nb\n```\n")
+        blocks = iter_blocks(source)
+        self.assertEqual((BlockType.HEADING_1, ["# Title"]), next(blocks))
+        # Only the lines of the first block have been consumed so far
+        self.assertEqual("- one\n", source.readline())
+        self.assertEqual([(BlockType.UNORDERED_LIST, ["- two"]),
+                          (BlockType.CODE, ["```", "a", "", "b", "```"])], list(blocks))
+
+    def test_unclosed_code_fence(self):
+        md = "```\nnever closed\n\n"
+        self.assertListEqual(["```\nnever closed"], markdown_to_blocks(md))
+
 
 
     """Suite de tests para la función block_to_block_type."""
@@ -953,6 +1040,35 @@ Block 2 line 2 \t\n\n\t Block 3 \t"""
         block = ">This is not a quote (no space)."
         self.assertEqual(BlockType.PARAGRAPH, block_to_block_type(block))
 
+    def test_ordered_list_past_nine(self):
+        block = "\n".join(f"{number}. item" for number in range(1, 12))
+        self.assertEqual(BlockType.ORDERED_LIST, block_to_block_type(block))
+
+    def test_horizontal_rule(self):
+        for block in ("---", "***", "___", "- - -", "*****"):
+            self.assertEqual(BlockType.HORIZONTAL_RULE, block_to_block_type(block))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("--"))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("-*-"))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("---\ntext"))
+
+    def test_table(self):
+        self.assertEqual(BlockType.TABLE, block_to_block_type("| a | b |\n|---|:-:|\n| 1 | 2 |"))
+        self.assertEqual(BlockType.TABLE, block_to_block_type("| a |\n| --- |"))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("| a | b |\n| 1 | 2 |"))
+        self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("| a |"))
+
+    def test_code_block_with_info_string(self):
+        self.assertEqual(BlockType.CODE, block_to_block_type("```python\nprint(1)\n```"))
+
+    def test_register_block_classifier(self):
+        classifier = lambda lines: BlockType.QUOTE if lines[0].startswith("!!! ") else None
+        register_block_classifier("!", classifier)
+        try:
+            self.assertEqual(BlockType.QUOTE, block_to_block_type("!!! note"))
+            self.assertEqual(BlockType.PARAGRAPH, block_to_block_type("!not a note"))
+        finally:
+            BLOCK_CLASSIFIERS["!"].remove(classifier)
+
 
 
     """Suite de tests para la conversión de Markdown a HTML."""
@@ -989,6 +1105,27 @@ Some text.
         expected_html = "<div><h1>Heading 1</h1><p>Some text.</p><h2>Heading 2 with <i>italic</i></h2><h6>Heading 6</h6></div>"
         self.assertEqual(expected_html, html)
 
+    def test_code_block_language_class(self):
+        node = markdown_to_html_node("```python\nprint(1)\n```")
+        self.assertEqual('<div><pre><code class="language-python">print(1)\n</code></pre></div>', node.to_html())
+
+    def test_basepath_only_applies_to_link_and_image_urls(self):
+        md = "[Home](/) ![Logo](/logo.png) [Out](https://example.com/)\n\n```\n<a href=\"/x\">\n```"
+        self.assertEqual(
+            '<div><p><a href="/site/">Home</a> <img src="/site/logo.png" alt="Logo"> <a href="https://example.com/">Out</a></p>'
+            '<pre><code><a href="/x">\n</code></pre></div>',
+            markdown_to_html_node(md, basepath="/site/").to_html(),
+        )
+
+    def test_horizontal_rule_and_table(self):
+        md = "---\n\n| Name | Size |\n|:-----|-----:|\n| **a** | 1 |\n| b |"
+        self.assertEqual(
+            '<div><hr><table><thead><tr><th style="text-align: left">Name</th><th style="text-align: right">Size</th></tr></thead>'
+            '<tbody><tr><td style="text-align: left"><b>a</b></td><td style="text-align: right">1</td></tr>'
+            '<tr><td style="text-align: left">b</td><td style="text-align: right"></td></tr></tbody></table></div>',
+            markdown_to_html_node(md).to_html(),
+        )
+
     def test_code_block(self):
         """Prueba la conversión de bloques de código."""
         md = """
@@ -1164,6 +1301,10 @@ Final code snippet
         with self.assertRaisesRegex(ValueError, "No level 1 heading found"):
             extract_title(md)
             
+    def test_title_from_front_matter(self):
+        self.assertEqual("Front", extract_title("---\ntitle: Front\n---\n# Heading"))
+        self.assertEqual("Heading", extract_title("---\ndate: 2024-01-01\n---\n# Heading"))
+
     def test_h1_followed_by_h2(self):
         """Prueba que encuentra el H1 incluso si hay otros encabezados después."""
         md = "Intro\n# The Main Title\n## A Subtitle\nMore text."
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import metadata
+from metadata import MetadataIndex, read_metadata, split_front_matter
+
+
+class TestFrontMatter(unittest.TestCase):
+
+    def test_split_front_matter(self):
+        lines = ["---\n", "title: \"Hello: world\"\n", "date: 2024-05-01\n", "draft: yes\n", "tags: [a, 'b c']\n", "---\n", "# Heading\n", "Body\n"]
+        meta, rest = split_front_matter(lines)
+        self.assertEqual({"title": "Hello: world", "date": "2024-05-01", "draft": True, "tags": ["a", "b c"]}, meta)
+        self.assertEqual(["# Heading\n", "Body\n"], list(rest))
+
+    def test_block_list_and_comma_tags(self):
+        meta, rest = split_front_matter(["---", "tags:", "- one", "- two", "---"])
+        self.assertEqual(["one", "two"], meta["tags"])
+        meta, rest = split_front_matter(["---", "tags: one, two", "---"])
+        self.assertEqual(["one", "two"], meta["tags"])
+
+    def test_without_front_matter(self):
+        meta, rest = split_front_matter(["# Title", "text"])
+        self.assertEqual({"title": None, "date": None, "draft": False, "tags": []}, meta)
+        self.assertEqual(["# Title", "text"], list(rest))
+
+    def test_unclosed_delimiter_is_not_front_matter(self):
+        meta, rest = split_front_matter(["---", "title: x", "# Title"])
+        self.assertEqual(None, meta["title"])
+        self.assertEqual(["---", "title: x", "# Title"], list(rest))
+
+    def test_invalid_line_raises(self):
+        with self.assertRaises(ValueError):
+            split_front_matter(["---", "not a pair", "---"])
+
+
+class TestMetadataIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.page = os.path.join(self.tmp.name, "page.md")
+        self.index_path = os.path.join(self.tmp.name, ".cache", "metadata.json")
+        self.write("---\ndraft: true\n---\n\n# Page\n\nBody")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text):
+        with open(self.page, "w") as file:
+            file.write(text)
+
+    def test_title_falls_back_to_heading(self):
+        self.assertEqual("Page", read_metadata(self.page)["title"])
+
+    def test_invalid_date_is_dropped(self):
+        self.write("---\ndate: May 1, 2024\n---\n\n# Page")
+        with self.assertLogs("static_generator", "WARNING"):
+            self.assertEqual(None, read_metadata(self.page)["date"])
+
+    def test_unchanged_pages_are_not_read_again(self):
+        index = MetadataIndex(self.index_path)
+        self.assertEqual(True, index.get(self.page)["draft"])
+        index.save()
+        reloaded = MetadataIndex(self.index_path)
+        with mock.patch.object(metadata, "read_metadata") as read:
+            self.assertEqual("Page", reloaded.get(self.page)["title"])
+            read.assert_not_called()
+
+    def test_changed_page_is_read_again(self):
+        index = MetadataIndex(self.index_path)
+        index.get(self.page)
+        self.write("# Published\n\nBody")
+        os.utime(self.page, ns=(0, 0))
+        meta = index.get(self.page)
+        self.assertEqual(("Published", False), (meta["title"], meta["draft"]))
+
+    def test_index_is_loaded_lazily_and_pruned(self):
+        index = MetadataIndex(self.index_path)
+        self.assertEqual(None, index._pages)
+        index.get(self.page)
+        index.prune([])
+        index.save()
+        self.assertEqual({}, MetadataIndex(self.index_path).pages([]))
+        self.assertEqual({}, MetadataIndex(self.index_path)._load())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -44,5 +44,20 @@ class TestParentNode(unittest.TestCase):
         self.assertRaises(ValueError, node.to_html)
 
 
+    def test_render_to_streams_fragments(self):
+        parent_node = ParentNode("div", [ParentNode("p", [LeafNode("b", "bold"), LeafNode(None, " text")])], {"class": "post"})
+        fragments = []
+        parent_node.render_to(fragments.append)
+        self.assertEqual(["<div class=\"post\">", "<p>", "<b>bold</b>", " text", "</p>", "</div>"], fragments)
+        self.assertEqual(parent_node.to_html(), "".join(fragments))
+
+    def test_deep_tree_to_html(self):
+        node = LeafNode(None, "x")
+        for _ in range(200):
+            node = ParentNode("span", [node, LeafNode(None, "y")])
+        html = node.to_html()
+        self.assertEqual(200, html.count("<span>"))
+        self.assertTrue(html.startswith("<span>" * 200 + "x"))
+
 if __name__ == "__main__":
     unittest.main()
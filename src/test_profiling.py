@@ -0,0 +1,90 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from mdparser import generate_pages_recursive
+from profiling import BuildProfiler
+
+
+class TestBuildProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.template = os.path.join(root, "template.html")
+        self.dest = os.path.join(root, "docs")
+        os.makedirs(self.content)
+        with open(self.template, "w") as file:
+            file.write("<a href=\"/x\">{{ Title }}</a>{{ Content }}")
+        with open(os.path.join(self.content, "small.md"), "w") as file:
+            file.write("# Small\n\n[home](/)")
+        with open(os.path.join(self.content, "large.md"), "w") as file:
+            file.write("# Large\n\n" + "Some **bold** text. " * 5000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, profiler):
+        profiler.start()
+        try:
+            return generate_pages_recursive(self.content, self.template, self.dest, "/site/", profiler=profiler)
+        finally:
+            profiler.stop()
+
+    def test_phases_and_pages(self):
+        profiler = BuildProfiler()
+        self.build(profiler)
+        self.assertEqual(1, profiler.phases["discovery"]["calls"])
+        for name in ("parse", "serialize", "template", "write"):
+            self.assertEqual(2, profiler.phases[name]["calls"])
+        slowest = profiler.slowest_pages(1)
+        self.assertEqual(os.path.join(self.content, "large.md"), slowest[0][0])
+        self.assertIn("Slowest 1 of 2 pages:", profiler.report(1))
+
+    def test_nested_phase_keeps_the_outer_peak(self):
+        profiler = BuildProfiler()
+        profiler.start()
+        try:
+            with profiler.phase("outer"):
+                data = bytearray(1 << 20)
+                del data
+                with profiler.phase("inner"):
+                    pass
+        finally:
+            profiler.stop()
+        self.assertGreaterEqual(profiler.phases["outer"]["peak"], 1 << 20)
+        self.assertLess(profiler.phases["inner"]["peak"], 1 << 20)
+
+    def test_profiled_output_matches_streamed_output(self):
+        self.build(BuildProfiler())
+        with open(os.path.join(self.dest, "small.html")) as file:
+            profiled = file.read()
+        generate_pages_recursive(self.content, self.template, self.dest, "/site/")
+        with open(os.path.join(self.dest, "small.html")) as file:
+            self.assertEqual(file.read(), profiled)
+        self.assertIn("<a href=\"/site/\">home</a>", profiled)
+
+    def test_chrome_trace(self):
+        profiler = BuildProfiler(track_allocations=False)
+        self.build(profiler)
+        path = os.path.join(self.tmp.name, "trace.json")
+        profiler.write(path)
+        with open(path) as file:
+            events = json.load(file)["traceEvents"]
+        self.assertEqual(9, len(events))
+        self.assertTrue(all(event["ph"] == "X" for event in events))
+
+    def test_pstats_dump(self):
+        profiler = BuildProfiler(track_allocations=False)
+        profiler.start(cprofile=True)
+        generate_pages_recursive(self.content, self.template, self.dest, "/", profiler=profiler)
+        profiler.stop()
+        path = os.path.join(self.tmp.name, "build.prof")
+        profiler.write(path)
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import mdparser
+from fragcache import FragmentCache
+from manifest import BuildManifest
+from mdparser import generate_pages_recursive, markdown_to_html_node
+from metadata import MetadataIndex
+from search import SearchTerms, page_terms, shard_name, write_search_index
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestSearchTerms(unittest.TestCase):
+
+    def test_page_terms(self):
+        self.assertEqual(["café", "hobbit", "x2"], page_terms(["The Hobbit, the HOBBIT", "café 1937 x2 a"]))
+
+    def test_shard_name(self):
+        self.assertEqual("ho", shard_name("hobbit"))
+        self.assertEqual("_5fa", shard_name("_a"))
+        self.assertEqual("c_e1", shard_name("cáfe"))
+
+    def test_text_comes_from_text_nodes(self):
+        text = []
+        markdown_to_html_node("# Title\n\nSome **bold** [link](/x) ![alt](/a.png)\n\n```\ncode\n```", text=text)
+        self.assertEqual(["Title", "Some ", "bold", " ", "link", " ", "alt", "code\n"], text)
+
+    def test_cached_blocks_keep_their_text(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FragmentCache(directory)
+            markdown = "# Title\n\n| a | b |\n|---|---|\n| **c** | d |"
+            first = []
+            markdown_to_html_node(markdown, cache, text=first)
+            second = []
+            with mock.patch.object(mdparser, "block_to_html_node") as build:
+                markdown_to_html_node(markdown, cache, text=second)
+                build.assert_not_called()
+            self.assertEqual(["Title", "a\nb\nc\nd"], first)
+            self.assertEqual(first, second)
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        with open(self.template, "w") as file:
+            file.write(TEMPLATE)
+        self.write("index.md", "# Home\n\nHobbits live here")
+        self.write("blog/post.md", "---\ntitle: Second breakfast\n---\n\nHobbits eat")
+        self.terms = SearchTerms(os.path.join(self.root, ".cache", "search.json"))
+        self.metadata = MetadataIndex(os.path.join(self.root, ".cache", "metadata.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative, text):
+        with open(os.path.join(self.content, relative), "w") as file:
+            file.write(text)
+
+    def read(self, name):
+        with open(os.path.join(self.dest, "search", name)) as file:
+            return json.load(file)
+
+    def build(self, manifest=None):
+        report = generate_pages_recursive(self.content, self.template, self.dest, "/", manifest, metadata=self.metadata, search=self.terms)
+        return write_search_index(self.content, self.dest, report.generated + report.skipped, self.terms, self.metadata)
+
+    def test_index_and_shards(self):
+        report = self.build()
+        index = self.read("index.json")
+        self.assertEqual([["blog/post.html", "Second breakfast"], ["", "Home"]], index["pages"])
+        self.assertIn("ho", index["shards"])
+        self.assertEqual({"home": [1], "hobbits": [0, 1]}, self.read("ho.json"))
+        self.assertEqual({"second": [0]}, self.read("se.json"))
+        self.assertEqual(len(index["shards"]), report.shards)
+
+    def test_skipped_pages_use_cached_terms(self):
+        manifest = BuildManifest(os.path.join(self.root, ".cache", "manifest.json"))
+        self.build(manifest)
+        self.terms.save()
+        self.terms = SearchTerms(self.terms.path)
+        with mock.patch.object(mdparser, "parse_page") as parse:
+            report = self.build(manifest)
+            parse.assert_not_called()
+        self.assertEqual([], report.written)
+        self.assertEqual({"home": [1], "hobbits": [0, 1]}, self.read("ho.json"))
+
+    def test_removed_terms_drop_their_shards(self):
+        self.build()
+        self.write("blog/post.md", "# Post\n\nHobbits")
+        report = self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "search", "se.json")))
+        self.assertIn(os.path.join(self.dest, "search", "se.json"), report.removed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from leafnode import LeafNode
+from parentnode import ParentNode
+from template import BASEPATH_MARKER, Template, compile_template, rewrite_basepath, with_basepath
+
+
+class TestTemplate(unittest.TestCase):
+
+    def test_chunks_and_slots(self):
+        template = Template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+        self.assertEqual(["<title>", "</title><body>", "</body>"], template.chunks)
+        self.assertEqual(["Title", "Content"], template.slots)
+
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}<h1>{{ Title }}</h1>")
+        content = ParentNode("p", [LeafNode("b", "Hi")])
+        self.assertEqual("<title>Home</title><p><b>Hi</b></p><h1>Home</h1>",
+                         template.render({"Title": "Home", "Content": content}))
+
+    def test_unknown_slot_is_kept(self):
+        template = Template("{{ Title }} {{ Author }}")
+        self.assertEqual("Home {{ Author }}", template.render({"Title": "Home"}))
+
+    def test_basepath_applied_to_template_only(self):
+        template = Template("<link href=\"/index.css\"><script src=\"//cdn.example/x.js\"></script>{{ Content }}", "/site/")
+        self.assertEqual(["<link href=\"/site/index.css\"><script src=\"//cdn.example/x.js\"></script>", ""], template.chunks)
+        # Content nodes carry their basepath already; literal text inside them is left alone
+        content = ParentNode("pre", [LeafNode("code", "<a href=\"/x\">")])
+        self.assertEqual("<link href=\"/site/index.css\"><script src=\"//cdn.example/x.js\"></script><pre><code><a href=\"/x\"></code></pre>",
+                         template.render({"Content": content}))
+
+    def test_with_basepath(self):
+        self.assertEqual("/site/a.png", with_basepath("/a.png", "/site/"))
+        self.assertEqual("a.png", with_basepath("a.png", "/site/"))
+        self.assertEqual("//cdn.example/a.png", with_basepath("//cdn.example/a.png", "/site/"))
+        self.assertEqual("https://example.com/", with_basepath("https://example.com/", "/site/"))
+
+    def test_render_targets_fills_in_each_basepath(self):
+        text = "<link href=\"/index.css\"><title>{{ Title }}</title>{{ Content }}"
+        content = ParentNode("p", [LeafNode("a", "Home", {"href": with_basepath("/", BASEPATH_MARKER)})])
+        rendered = Template(text, BASEPATH_MARKER).render_targets({"Title": "Home", "Content": content}, ["/", "/site/"])
+        self.assertEqual(["<link href=\"/index.css\"><title>Home</title><p><a href=\"/\">Home</a></p>",
+                          "<link href=\"/site/index.css\"><title>Home</title><p><a href=\"/site/\">Home</a></p>"], rendered)
+
+    def test_render_targets_needs_marker_template(self):
+        with self.assertRaises(ValueError):
+            Template("{{ Content }}", "/site/").render_targets({}, ["/"])
+
+    def test_rewrite_basepath_root_is_noop(self):
+        text = "<a href=\"/x\">"
+        self.assertIs(text, rewrite_basepath(text, "/"))
+
+    def test_compile_template_is_cached_until_modified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as file:
+                file.write("<b>{{ Title }}</b>")
+            first = compile_template(path, "/")
+            self.assertIs(first, compile_template(path, "/"))
+            self.assertIsNot(first, compile_template(path, "/other/"))
+            with open(path, "w") as file:
+                file.write("<i>{{ Title }}</i>")
+            os.utime(path, ns=(0, 0))
+            self.assertEqual("<i>x</i>", compile_template(path, "/").render({"Title": "x"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
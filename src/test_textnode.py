@@ -27,6 +27,12 @@ class TestTextNode(unittest.TestCase):
         node2=TextNode("Text",TextType.LINK)
         self.assertEqual(node1,node2)
 
+    def test_slots(self):
+        node = TextNode("Text", TextType.NORMAL)
+        self.assertFalse(hasattr(node, "__dict__"))
+        with self.assertRaises(AttributeError):
+            node.extra = 1
+
 
 
 if __name__ == "__main__":
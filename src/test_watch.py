@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import mdparser
+from discovery import ContentFilter
+from manifest import BuildManifest
+from mdparser import generate_pages_recursive
+from watch import PollingWatcher, SiteRebuilder, watch_loop
+
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.docs = os.path.join(root, "docs")
+        self.template = os.path.join(root, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.manifest = BuildManifest(os.path.join(root, "manifest.json"))
+        generate_pages_recursive(self.content, self.template, self.docs, "/", self.manifest)
+        self.builds = []
+        self.rebuilder = SiteRebuilder(self.content, self.static, self.template, self.build)
+
+    def build(self, changed):
+        self.builds.extend(sorted(changed))
+        generate_pages_recursive(self.content, self.template, self.docs, "/", self.manifest,
+                                 content_filter=ContentFilter(self.content), changed=changed)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def read(self, path):
+        with open(path) as file:
+            return file.read()
+
+    def test_polling_watcher(self):
+        watcher = PollingWatcher([self.content, self.template])
+        self.assertEqual(set(), watcher.poll())
+        post = os.path.join(self.content, "blog", "post.md")
+        new = os.path.join(self.content, "new.md")
+        self.write(post, "# Post, edited")
+        self.write(new, "# New")
+        self.assertEqual({post, new}, watcher.poll())
+        os.remove(new)
+        self.assertEqual({new}, watcher.poll())
+
+    def test_markdown_change_regenerates_only_that_page(self):
+        index_html = os.path.join(self.docs, "index.html")
+        os.utime(index_html, (0, 0))
+        post = os.path.join(self.content, "blog", "post.md")
+        self.write(post, "# Edited post")
+        with mock.patch.object(mdparser, "file_hash", wraps=mdparser.file_hash) as hashed:
+            self.rebuilder.rebuild({post})
+        self.assertEqual([post], self.builds)
+        self.assertIn("Edited post", self.read(os.path.join(self.docs, "blog", "post.html")))
+        self.assertEqual(0, os.path.getmtime(index_html))
+        self.assertNotIn(mock.call(os.path.join(self.content, "index.md")), hashed.call_args_list)
+
+    def test_deleted_markdown_removes_page(self):
+        post = os.path.join(self.content, "blog", "post.md")
+        os.remove(post)
+        self.rebuilder.rebuild({post})
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "post.html")))
+        self.assertNotIn(post, self.manifest.pages)
+
+    def test_template_change_rebuilds_every_page(self):
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.rebuilder.rebuild({self.template})
+        self.assertTrue(self.read(os.path.join(self.docs, "index.html")).startswith("<h1>Home</h1>"))
+        self.assertTrue(self.read(os.path.join(self.docs, "blog", "post.html")).startswith("<h1>Post</h1>"))
+
+    def test_ignored_changes_do_not_build(self):
+        swap = os.path.join(self.content, ".post.md.swp")
+        self.write(swap, "")
+        self.rebuilder.rebuild({swap})
+        self.assertEqual([], self.builds)
+        css = os.path.join(self.static, "index.css")
+        self.rebuilder.rebuild({swap, css})
+        self.assertEqual([css], self.builds)
+
+    def test_ignore_file_is_reloaded(self):
+        ignore = os.path.join(self.content, ".contentignore")
+        self.write(ignore, "blog/\n")
+        self.rebuilder.rebuild({ignore})
+        self.assertEqual(["blog/"], self.rebuilder.content_filter.ignored)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "post.html")))
+
+    def test_watch_loop_debounces(self):
+        post = os.path.join(self.content, "blog", "post.md")
+        polls = [{post}, {post}, set(), set(), set()]
+        batches = []
+
+        class FakeWatcher:
+            def poll(self):
+                return polls.pop(0) if len(polls) != 0 else set()
+
+        watch_loop(FakeWatcher(), batches.append, interval=0, debounce=0, should_stop=lambda: len(polls) == 0)
+        self.assertEqual([{post}], batches)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import writer
+from writer import OutputWriter, write_output, write_stream
+
+
+class TestWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_write_output_skips_identical_bytes(self):
+        path = os.path.join(self.root, "page.html")
+        self.assertTrue(write_output(path, b"<p>a</p>"))
+        os.utime(path, ns=(0, 0))
+        self.assertFalse(write_output(path, b"<p>a</p>"))
+        self.assertEqual(0, os.stat(path).st_mtime_ns)
+        self.assertTrue(write_output(path, b"<p>b</p>"))
+        with open(path, "rb") as file:
+            self.assertEqual(b"<p>b</p>", file.read())
+
+    def test_write_stream_replaces_only_changed_files(self):
+        path = os.path.join(self.root, "sitemap.xml")
+        self.assertTrue(write_stream(path, iter(["<a>", "</a>"])))
+        os.utime(path, ns=(0, 0))
+        self.assertFalse(write_stream(path, iter(["<a></a>"])))
+        self.assertEqual(0, os.stat(path).st_mtime_ns)
+        self.assertTrue(write_stream(path, iter(["<b></b>"])))
+        with open(path) as file:
+            self.assertEqual("<b></b>", file.read())
+        self.assertEqual(["sitemap.xml"], os.listdir(self.root))
+
+    def test_failed_atomic_write_keeps_old_file(self):
+        path = os.path.join(self.root, "page.html")
+        write_output(path, b"old")
+        with mock.patch.object(writer.os, "replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                write_output(path, b"new")
+        with open(path, "rb") as file:
+            self.assertEqual(b"old", file.read())
+        self.assertEqual(["page.html"], os.listdir(self.root))
+
+    def test_writer_creates_directories_and_counts(self):
+        paths = [os.path.join(self.root, "docs", f"section{index % 3}", f"page{index}.html") for index in range(20)]
+        with OutputWriter(workers=4, max_pending=2) as output:
+            output.make_dirs(paths)
+            futures = [output.submit(path, path.encode()) for path in paths]
+            futures.append(output.submit(paths[0], paths[0].encode()))
+        self.assertTrue(all(future.exception() == None for future in futures))
+        self.assertEqual((20, 1), (output.written, output.unchanged))
+        with open(paths[7], "rb") as file:
+            self.assertEqual(paths[7].encode(), file.read())
+
+    def test_inline_writer_reports_errors_through_future(self):
+        blocker = os.path.join(self.root, "file")
+        write_output(blocker, b"")
+        output = OutputWriter(workers=0)
+        future = output.submit(os.path.join(blocker, "page.html"), b"x")
+        self.assertTrue(future.done())
+        self.assertIsInstance(future.exception(), OSError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+from buildlog import logger
+from discovery import ContentFilter
+import os
+import time
+
+
+class PollingWatcher:
+    # Polls mtimes and sizes, so it works on any filesystem without inotify
+    def __init__(self, paths: list[str]):
+        self.paths = paths
+        self.snapshot = self.scan()
+
+    def scan(self) -> dict:
+        snapshot = {}
+        for path in self.paths:
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+                continue
+            for dir_path, dir_names, file_names in os.walk(path):
+                for file_name in file_names:
+                    file_path = os.path.join(dir_path, file_name)
+                    try:
+                        stat = os.stat(file_path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def poll(self) -> set[str]:
+        current = self.scan()
+        changed = set()
+        for path, signature in current.items():
+            if self.snapshot.get(path) != signature:
+                changed.add(path)
+        changed.update(set(self.snapshot) - set(current))
+        self.snapshot = current
+        return changed
+
+
+class SiteRebuilder:
+    # Picks the changes that affect the site and hands them to build, which runs the same
+    # incremental build as the command line, so every target, the drafts, images, feeds,
+    # search index and precompressed variants are updated the way a full build would
+    def __init__(self, content_dir: str, static_dir: str, template_path: str, build, content_filter: ContentFilter = None):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.build = build
+        self.content_filter = content_filter if content_filter != None else ContentFilter(content_dir)
+
+    def watched_paths(self) -> list[str]:
+        return [self.content_dir, self.static_dir, self.template_path]
+
+    def _under(self, path: str, directory: str) -> bool:
+        return path.startswith(directory.rstrip(os.sep) + os.sep)
+
+    def relevant(self, changes: set[str]) -> set[str]:
+        relevant = set()
+        for path in changes:
+            if path == self.template_path or path == self.content_filter.ignore_path or self._under(path, self.static_dir):
+                relevant.add(path)
+            elif self._under(path, self.content_dir) and self.content_filter.accepts(self.content_filter.relative(path)):
+                relevant.add(path)
+        return relevant
+
+    def rebuild(self, changes: set[str]):
+        if self.content_filter.ignore_path in changes:
+            self.content_filter.reload()
+        relevant = self.relevant(changes)
+        if len(relevant) == 0:
+            return
+        if self.template_path in relevant or self.content_filter.ignore_path in relevant:
+            logger.info("Template or ignore file changed, checking every page")
+        else:
+            logger.info("Rebuilding after changes to %s", ", ".join(sorted(relevant)))
+        self.build(relevant)
+
+
+def watch_loop(watcher: PollingWatcher, on_change, interval: float = 0.5, debounce: float = 0.2, should_stop = None):
+    # Changes are collected until nothing new has shown up for `debounce` seconds
+    pending = set()
+    last_change = 0.0
+    while should_stop == None or should_stop() == False:
+        changes = watcher.poll()
+        now = time.monotonic()
+        if len(changes) != 0:
+            pending.update(changes)
+            last_change = now
+        elif len(pending) != 0 and now - last_change >= debounce:
+            batch = pending
+            pending = set()
+            try:
+                on_change(batch)
+            except Exception:
+                logger.exception("Rebuild failed")
+        time.sleep(interval)
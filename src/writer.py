@@ -0,0 +1,132 @@
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import os
+import threading
+
+
+def write_output(path: str, data: bytes, atomic: bool = True) -> bool:
+    # Returns False when the file already holds exactly these bytes. Atomic writes go
+    # to a temporary file next to the target and replace it, so readers never see half a page
+    try:
+        if os.stat(path).st_size == len(data):
+            with open(path, "rb") as file:
+                if file.read() == data:
+                    return False
+    except FileNotFoundError:
+        pass
+    if atomic == False:
+        with open(path, "wb") as file:
+            file.write(data)
+        return True
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+def _same_digest(path: str, size: int, digest: bytes) -> bool:
+    try:
+        if os.stat(path).st_size != size:
+            return False
+        existing = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 16), b""):
+                existing.update(chunk)
+        return existing.digest() == digest
+    except FileNotFoundError:
+        return False
+
+
+def write_stream(path: str, chunks: Iterable[str]) -> bool:
+    # write_output for documents too large to hold in memory: the chunks go straight to a
+    # temporary file, which replaces path only when its content differs
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as file:
+            for chunk in chunks:
+                data = chunk.encode("utf-8")
+                digest.update(data)
+                size += len(data)
+                file.write(data)
+        if _same_digest(path, size, digest.digest()):
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+class OutputWriter:
+    # Writes finished pages on a background thread pool; with workers=0 every write
+    # happens inline. At most max_pending pages wait in memory for their write.
+    def __init__(self, workers: int = 4, atomic: bool = True, max_pending: int = 64):
+        self.atomic = atomic
+        self.written = 0
+        self.unchanged = 0
+        self._lock = threading.Lock()
+        self._dirs = set()
+        self._executor = None
+        self._pending = None
+        if workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="writer")
+            self._pending = threading.BoundedSemaphore(max(1, max_pending))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def make_dirs(self, paths):
+        # Creates the parent directory of every path once, instead of once per write
+        parents = {os.path.dirname(path) for path in paths}
+        with self._lock:
+            parents -= self._dirs
+        for parent in sorted(parents):
+            if parent != "":
+                os.makedirs(parent, exist_ok=True)
+        with self._lock:
+            self._dirs |= parents
+
+    def _write(self, path: str, data: bytes) -> bool:
+        self.make_dirs([path])
+        changed = write_output(path, data, self.atomic)
+        with self._lock:
+            if changed == True:
+                self.written += 1
+            else:
+                self.unchanged += 1
+        return changed
+
+    def submit(self, path: str, data: bytes) -> Future:
+        if self._executor == None:
+            future = Future()
+            try:
+                future.set_result(self._write(path, data))
+            except Exception as error:
+                future.set_exception(error)
+            return future
+        self._pending.acquire()
+        try:
+            future = self._executor.submit(self._write, path, data)
+        except BaseException:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda future: self._pending.release())
+        return future
+
+    def close(self):
+        if self._executor != None:
+            self._executor.shutdown(wait=True)